@@ -12,6 +12,14 @@ class CheckboxTreeview(ttk.Treeview):
     def __init__(self, master, **kw):
         super().__init__(master, **kw)
         self._checked = set()
+        # Python-side mirror of the item hierarchy so subtree walks do not
+        # need a Tcl get_children() round-trip per node
+        self._children = {'': []}
+        self._parent = {}
+        # item -> label without the checkbox prefix, and the prefix state
+        # currently shown, so marking costs at most one Tcl call per item
+        self._labels = {}
+        self._marks = {}
         self.bind('<Button-1>', self._on_click)
         self.bind('<space>', self._on_space)
 
@@ -32,40 +40,99 @@ class CheckboxTreeview(ttk.Treeview):
         else:
             self._check(item)
 
+    def _iter_descendants(self, item):
+        """Yield *item* and everything below it, depth-first, without recursion."""
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(self._children.get(node, ()))
+
+    def _set_mark(self, item, checked):
+        if self._marks.get(item) is checked:
+            return
+        label = self._labels.get(item)
+        if label is None:
+            label = self.item(item, 'text')
+            if label.startswith(('[v] ', '[_] ')):
+                label = label[4:]
+            self._labels[item] = label
+        # Straight to Tcl: Treeview.item() would format an option dict
+        # for what is always a single -text write
+        self.tk.call(self._w, 'item', item, '-text',
+                     ('[v] ' if checked else '[_] ') + label)
+        self._marks[item] = checked
+
     def _check(self, item):
-        self._checked.add(item)
-        txt = self.item(item, 'text')
-        if txt.startswith('[_] '):
-            self.item(item, text='[v] ' + txt[4:])
-        elif not txt.startswith('[v] '):
-            self.item(item, text='[v] ' + txt)
-        for child in self.get_children(item):
-            self._check(child)
+        nodes = list(self._iter_descendants(item))
+        self._checked.update(nodes)
+        for node in nodes:
+            self._set_mark(node, True)
 
     def _uncheck(self, item):
-        self._checked.discard(item)
-        txt = self.item(item, 'text')
-        if txt.startswith('[v] '):
-            self.item(item, text='[_] ' + txt[4:])
-        elif not txt.startswith('[_] '):
-            self.item(item, text='[_] ' + txt)
-        for child in self.get_children(item):
-            self._uncheck(child)
+        nodes = list(self._iter_descendants(item))
+        self._checked.difference_update(nodes)
+        for node in nodes:
+            self._set_mark(node, False)
+
+    # _parent holds every item in the tree, so the bulk operations walk it
+    # directly instead of descending from each root
 
     def check_all(self):
-        for item in self.get_children(''):
-            self._check(item)
+        self._checked.update(self._parent)
+        for item in self._parent:
+            self._set_mark(item, True)
 
     def uncheck_all(self):
-        for item in self.get_children(''):
-            self._uncheck(item)
+        self._checked.clear()
+        for item in self._parent:
+            self._set_mark(item, False)
 
     def get_checked(self):
         return set(self._checked)
 
+    def insert(self, parent, index, iid=None, **kw):
+        item = super().insert(parent, index, iid, **kw)
+        kids = self._children.setdefault(parent, [])
+        if index == 'end':
+            kids.append(item)
+        else:
+            kids.insert(self.index(item), item)
+        self._children[item] = []
+        self._parent[item] = parent
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            if item not in self._parent:
+                continue
+            siblings = self._children.get(self._parent[item])
+            if siblings and item in siblings:
+                siblings.remove(item)
+            for node in list(self._iter_descendants(item)):
+                self._children.pop(node, None)
+                self._parent.pop(node, None)
+                self._labels.pop(node, None)
+                self._marks.pop(node, None)
+                self._checked.discard(node)
+        super().delete(*items)
+
+    def clear(self):
+        """Remove every item with one Tcl delete and reset the mirrors."""
+        roots = self._children['']
+        if roots:
+            super().delete(*roots)
+        self._checked.clear()
+        self._children = {'': []}
+        self._parent.clear()
+        self._labels.clear()
+        self._marks.clear()
+
     def insert_with_check(self, parent, index, text='', checked=True, **kw):
         prefix = '[v] ' if checked else '[_] '
         item = self.insert(parent, index, text=prefix + text, **kw)
+        self._labels[item] = text
+        self._marks[item] = checked
         if checked:
             self._checked.add(item)
         return item
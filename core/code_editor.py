@@ -6,7 +6,10 @@ code_editor.py — Built-in code editor widget for ProjectScan
 
 import os
 import re
+import threading
 import tkinter as tk
+import tkinter.font as tkfont
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
 from .encoding_handler import EncodingHandler
 
@@ -42,12 +45,27 @@ class CodeEditor(tk.Frame):
                'true','false','null','undefined','typeof','instanceof'],
     }
 
+    # (tag, options) for the syntax tags, configured once per editor
+    TAG_STYLES = (
+        ('keyword', {'foreground': '#cba6f7'}),
+        ('string', {'foreground': '#a6e3a1'}),
+        ('comment', {'foreground': '#6c7086', 'font': ('Consolas', 10, 'italic')}),
+        ('number', {'foreground': '#fab387'}),
+    )
+
     def __init__(self, master, **kw):
         super().__init__(master, **kw)
         self._file_path = None
         self._original = ''
         self._modified = False
         self._lang = 'default'
+        self._load_seq = 0
+        self._filling = False  # a load is being inserted chunk by chunk
+        self._loading = False  # a load_file request has not settled yet
+        self._ln_count = 0
+        self._hl_job = None
+        # One writer per editor, so saves reach the disk in request order
+        self._save_pool = ThreadPoolExecutor(max_workers=1)
         self._setup_ui()
 
     def _setup_ui(self):
@@ -56,12 +74,14 @@ class CodeEditor(tk.Frame):
         self._header.pack(fill='x')
         body = tk.Frame(self, bg='#1e1e2e')
         body.pack(fill='both', expand=True)
+        # One font object shared by the gutter and the buffer
+        self._font = tkfont.Font(self, family='Consolas', size=10)
         self._ln = tk.Text(body, width=5, bg='#181825', fg='#6c7086',
-            font=('Consolas', 10), state='disabled', relief='flat',
+            font=self._font, state='disabled', relief='flat',
             selectbackground='#181825', cursor='arrow', padx=4)
         self._ln.pack(side='left', fill='y')
         self._text = tk.Text(body, bg='#1e1e2e', fg='#cdd6f4',
-            font=('Consolas', 10), insertbackground='#f5e0dc',
+            font=self._font, insertbackground='#f5e0dc',
             selectbackground='#45475a', undo=True, wrap='none', relief='flat', padx=4)
         self._text.pack(side='left', fill='both', expand=True)
         sb = ttk.Scrollbar(body, command=self._sync_scroll)
@@ -79,25 +99,34 @@ class CodeEditor(tk.Frame):
         self._text.after(10, self._update_line_numbers)
 
     def _setup_tags(self):
-        self._text.tag_configure('keyword', foreground='#cba6f7')
-        self._text.tag_configure('string', foreground='#a6e3a1')
-        self._text.tag_configure('comment', foreground='#6c7086',
-                                 font=('Consolas', 10, 'italic'))
-        self._text.tag_configure('number', foreground='#fab387')
+        for tag, opts in self.TAG_STYLES:
+            self._text.tag_configure(tag, **opts)
 
     def _on_edit(self, event=None):
+        # Arrow keys, selection and other keys that leave the buffer alone
+        # only need the gutter kept in step with the view
+        if not self._text.edit_modified():
+            self._ln.yview_moveto(self._text.yview()[0])
+            return
+        self._text.edit_modified(False)
         self._modified = True
         if self._file_path:
             self._header.config(text="* modified -- " + os.path.basename(self._file_path))
         self._update_line_numbers()
-        self._highlight()
+        self._schedule_highlight()
 
     def _update_line_numbers(self):
-        self._ln.config(state='normal')
-        self._ln.delete('1.0', 'end')
+        # Only append or trim the lines that changed since the last call
         cnt = int(self._text.index('end-1c').split('.')[0])
-        self._ln.insert('1.0', '\n'.join(str(i) for i in range(1, cnt + 1)))
-        self._ln.config(state='disabled')
+        if cnt != self._ln_count:
+            self._ln.config(state='normal')
+            if cnt > self._ln_count:
+                nums = '\n'.join(str(i) for i in range(self._ln_count + 1, cnt + 1))
+                self._ln.insert('end-1c', ('\n' if self._ln_count else '') + nums)
+            else:
+                self._ln.delete('%d.end' % cnt, 'end-1c')
+            self._ln.config(state='disabled')
+            self._ln_count = cnt
         self._ln.yview_moveto(self._text.yview()[0])
 
     def _detect_lang(self, path):
@@ -107,75 +136,202 @@ class CodeEditor(tk.Frame):
              '.c': 'cs', '.cpp': 'cs', '.h': 'cs', '.hpp': 'cs'}
         return m.get(ext, 'default')
 
+    _TOKEN_RES = {}
+
+    @classmethod
+    def _token_re(cls, lang):
+        """One alternation of all token categories for *lang*, built once."""
+        rx = cls._TOKEN_RES.get(lang)
+        if rx is None:
+            groups = []
+            kws = sorted(cls.KEYWORDS.get(lang, []), key=len, reverse=True)
+            if kws:
+                groups.append(r'(?P<keyword>\b(?:%s)\b)' % '|'.join(map(re.escape, kws)))
+            if lang == 'vb':
+                groups.append(r"(?P<comment>'[^\n]*)")
+                groups.append(r'(?P<string>"[^"\n]*")')
+            else:
+                groups.append(r'(?P<string>"[^"\n]*"|\'[^\'\n]*\')')
+                groups.append(r'(?P<comment>//[^\n]*)')
+            groups.append(r'(?P<number>\b\d+\.?\d*\b)')
+            rx = cls._TOKEN_RES[lang] = re.compile('|'.join(groups))
+        return rx
+
+    HIGHLIGHT_DELAY = 150  # ms of typing pause before re-highlighting
+
+    def _schedule_highlight(self):
+        """Re-highlight once typing pauses rather than on every keystroke."""
+        if self._hl_job is not None:
+            self.after_cancel(self._hl_job)
+        self._hl_job = self.after(self.HIGHLIGHT_DELAY, self._highlight)
+
     def _highlight(self):
-        for tag in ('keyword', 'string', 'comment', 'number'):
+        if self._hl_job is not None:
+            self.after_cancel(self._hl_job)
+            self._hl_job = None
+        for tag, _ in self.TAG_STYLES:
             self._text.tag_remove(tag, '1.0', 'end')
         content = self._text.get('1.0', 'end')
-        kws = self.KEYWORDS.get(self._lang, [])
-        for kw in kws:
-            pat = r'\b' + re.escape(kw) + r'\b'
-            for m in re.finditer(pat, content):
-                self._text.tag_add('keyword', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-        for m in re.finditer(r'"[^"\n]*"', content):
-            self._text.tag_add('string', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-        for m in re.finditer(r"'[^'\n]*'", content):
-            self._text.tag_add('string', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-        if self._lang == 'vb':
-            for m in re.finditer(r"'[^\n]*", content):
-                self._text.tag_add('comment', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-        else:
-            for m in re.finditer(r'//[^\n]*', content):
-                self._text.tag_add('comment', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-        for m in re.finditer(r'\b\d+\.?\d*\b', content):
-            self._text.tag_add('number', f"1.0+{m.start()}c", f"1.0+{m.end()}c")
-
-    def load_file(self, path):
-        try:
-            content, enc, bom, le = EncodingHandler.read_file(path)
-        except Exception as e:
-            messagebox.showerror("file open error", str(e))
+        # Collect ranges per tag; one tag_add call takes any number of pairs.
+        # No token spans a newline, so matching line by line yields "L.C"
+        # indices directly instead of "1.0+Nc" offsets Tk has to walk
+        ranges = {tag: [] for tag, _ in self.TAG_STYLES}
+        finditer = self._token_re(self._lang).finditer
+        for ln, line in enumerate(content.split('\n'), 1):
+            for m in finditer(line):
+                ranges[m.lastgroup] += (f"{ln}.{m.start()}", f"{ln}.{m.end()}")
+        for tag, idx in ranges.items():
+            if idx:
+                self._text.tag_add(tag, *idx)
+
+    def load_file(self, path, on_loaded=None):
+        """
+        Read *path* on a worker thread; only the most recent request is shown.
+
+        on_loaded(file_path, error) runs on the Tk thread once the load
+        settles, with the file now attached and None on success, or the
+        previous file (or None) and the exception if it failed; without a
+        callback a failure is shown in a message box.
+        """
+        self._load_seq += 1
+        seq = self._load_seq
+        self._loading = True
+        self._header.config(text="loading -- " + os.path.basename(path))
+
+        def do_read():
+            try:
+                result = EncodingHandler.read_file(path)
+            except Exception as e:
+                result = e
+            self.after(0, lambda: self._finish_load(seq, path, result, on_loaded))
+
+        threading.Thread(target=do_read, daemon=True).start()
+
+    def _finish_load(self, seq, path, result, on_loaded=None):
+        if seq != self._load_seq:
             return
-        self._file_path = path
+        # An earlier load may have been cut off mid-fill, read-only
+        self._text.config(state='normal')
+        if isinstance(result, Exception):
+            if self._filling:
+                # Drop the half-filled earlier file and put the buffer
+                # back in its normal editable state
+                self._filling = False
+                self._text.delete('1.0', 'end')
+                self._text.config(undo=True)
+                self._text.edit_reset()
+                self._text.edit_modified(False)
+                self._update_line_numbers()
+            self._loading = False
+            # Whatever file is still attached stays open; show it again
+            if self._file_path:
+                self._header.config(text=("* modified -- " if self._modified else "")
+                                    + os.path.basename(self._file_path))
+            else:
+                self._header.config(text="editor -- select a file")
+            if on_loaded:
+                on_loaded(self._file_path, result)
+            else:
+                messagebox.showerror("file open error", str(result))
+            return
+        content, enc, bom, le = result
+        # No file is attached while the buffer is being filled, so a save
+        # in the meantime cannot write partial text anywhere
+        self._file_path = None
         self._original = content
         self._modified = False
         self._lang = self._detect_lang(path)
+        # A freshly loaded file has nothing to undo; keep the bulk insert
+        # out of the undo stack
+        self._text.config(undo=False)
         self._text.delete('1.0', 'end')
-        self._text.insert('1.0', content)
+        self._filling = True
+        self._fill(seq, path, content, 0, on_loaded)
+
+    LOAD_CHUNK = 1 << 20  # chars handed to Tk per insert when loading
+
+    def _fill(self, seq, path, content, pos, on_loaded=None):
+        """Insert *content* in chunks, yielding to the event loop between them."""
+        if seq != self._load_seq:
+            return
+        end = pos + self.LOAD_CHUNK
+        self._text.config(state='normal')
+        self._text.insert('end-1c', content[pos:end])
+        if end < len(content):
+            # Read-only until the whole file is in
+            self._text.config(state='disabled')
+            self.after(1, lambda: self._fill(seq, path, content, end, on_loaded))
+            return
+        self._file_path = path
+        self._filling = False
+        self._loading = False
+        self._text.edit_reset()
+        self._text.config(undo=True)
+        self._text.edit_modified(False)
         self._header.config(text=os.path.basename(path))
         self._update_line_numbers()
         self._highlight()
+        if on_loaded:
+            on_loaded(path, None)
 
     def get_content(self):
         return self._text.get('1.0', 'end-1c')
 
     def set_content(self, text):
+        # Record the whole replacement as a single undo step
+        self._text.config(autoseparators=False)
+        self._text.edit_separator()
         self._text.delete('1.0', 'end')
         self._text.insert('1.0', text)
+        self._text.edit_separator()
+        self._text.config(autoseparators=True)
+        self._text.edit_modified(False)
         self._modified = True
         if self._file_path:
             self._header.config(text="* modified -- " + os.path.basename(self._file_path))
         self._update_line_numbers()
         self._highlight()
 
-    def save_file(self):
+    def save_file(self, on_done=None):
+        """Write the buffer on a worker thread; on_done(ok) runs on the Tk thread."""
         if not self._file_path:
             messagebox.showwarning("save", "no file open")
             return False
-        try:
-            _, enc, bom, le = EncodingHandler.read_file(self._file_path)
-            EncodingHandler.write_file(self._file_path, self.get_content(), enc, bom, le)
-            self._original = self.get_content()
-            self._modified = False
-            self._header.config(text=os.path.basename(self._file_path))
-            return True
-        except Exception as e:
-            messagebox.showerror("save error", str(e))
-            return False
+        path = self._file_path
+        content = self.get_content()
+
+        def do_write():
+            try:
+                _, enc, bom, le = EncodingHandler.read_file(path)
+                EncodingHandler.write_file(path, content, enc, bom, le)
+                err = None
+            except Exception as e:
+                err = e
+            self.after(0, lambda: self._finish_save(path, content, err, on_done))
+
+        self._save_pool.submit(do_write)
+        return True
+
+    def _finish_save(self, path, content, err, on_done):
+        if err is not None:
+            messagebox.showerror("save error", str(err))
+        elif path == self._file_path:
+            self._original = content
+            # Keystrokes made while the write was in flight stay unsaved
+            self._modified = self.get_content() != content
+            self._header.config(text=("* modified -- " if self._modified else "")
+                                + os.path.basename(path))
+        if on_done:
+            on_done(err is None)
 
     @property
     def file_path(self):
         return self._file_path
 
+    @property
+    def is_loading(self):
+        return self._loading
+
     @property
     def is_modified(self):
         return self._modified
@@ -79,8 +79,19 @@ class CodeReviewer:
         re.compile(r'^\s*ipdb\.set_trace\s*\('),
     ]
 
+    # All debug patterns as one alternation, so each line is scanned once
+    DEBUG_RE = re.compile('|'.join(
+        ('(?i:%s)' if p.flags & re.IGNORECASE else '(?:%s)') % p.pattern
+        for p in DEBUG_PATTERNS))
+
     TODO_PATTERN = re.compile(r'#\s*(TODO|FIXME|HACK|XXX)\b', re.IGNORECASE)
 
+    NAMESPACE_PATTERN = re.compile(r'^\s*namespace\s+')
+
+    JS_CONSOLE_PATTERN = re.compile(r'^\s*console\.(log|debug|warn|error|info)\s*\(')
+    JS_DEBUGGER_PATTERN = re.compile(r'^\s*debugger\s*;?\s*$')
+    JS_ALERT_PATTERN = re.compile(r'^\s*alert\s*\(')
+
     MAX_LINE_LENGTH = 120
 
     def __init__(self, max_line_length=120):
@@ -88,13 +99,16 @@ class CodeReviewer:
 
     def review_file(self, filepath, content=None):
         if content is None:
-            if not os.path.isfile(filepath):
-                return []
+            # Files reviewed after an apply were just written; a missing
+            # or unreadable path surfaces from open() below
             try:
                 with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
                     content = f.read()
             except Exception:
                 return []
+        elif '\r' in content:
+            # Same newlines as a text-mode read of the file would give
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
 
         ext = os.path.splitext(filepath)[1].lower()
 
@@ -282,7 +296,7 @@ class CodeReviewer:
         brace_depth = 0
         for i, line in enumerate(lines, 1):
             stripped = line.strip()
-            if ext == '.cs' and re.match(r'^\s*namespace\s+', stripped):
+            if ext == '.cs' and self.NAMESPACE_PATTERN.match(stripped):
                 if brace_depth > 1:
                     issues.append(self._issue(fp, i, self.WARNING, 'W020',
                         "namespace declared at depth %d - possible brace error" % brace_depth))
@@ -402,11 +416,9 @@ class CodeReviewer:
         issues = []
         lines = content.split('\n')
         for i, line in enumerate(lines, 1):
-            for pat in self.DEBUG_PATTERNS:
-                if pat.search(line):
-                    issues.append(self._issue(fp, i, self.WARNING, 'W008',
-                        'Debug statement: ' + line.strip()[:60]))
-                    break
+            if self.DEBUG_RE.search(line):
+                issues.append(self._issue(fp, i, self.WARNING, 'W008',
+                    'Debug statement: ' + line.strip()[:60]))
         return issues
 
     # -- JavaScript/TypeScript checks --
@@ -414,9 +426,9 @@ class CodeReviewer:
     def _check_js_patterns(self, fp, content):
         issues = []
         lines = content.split('\n')
-        console_re = re.compile(r'^\s*console\.(log|debug|warn|error|info)\s*\(')
-        debugger_re = re.compile(r'^\s*debugger\s*;?\s*$')
-        alert_re = re.compile(r'^\s*alert\s*\(')
+        console_re = self.JS_CONSOLE_PATTERN
+        debugger_re = self.JS_DEBUGGER_PATTERN
+        alert_re = self.JS_ALERT_PATTERN
         for i, line in enumerate(lines, 1):
             if console_re.search(line):
                 issues.append(self._issue(fp, i, self.INFO, 'W008',
@@ -15,6 +15,11 @@ v6.1 fixes:
 import os
 import re
 import shutil
+import stat
+import tempfile
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from .encoding_handler import EncodingHandler, TextNormalizer
 
 
@@ -279,6 +284,83 @@ def check_brace_balance(text):
     return True, "braces balanced: %d open, %d close" % (opens, closes)
 
 
+def _merge_edits(lines, edits):
+    """
+    Splice non-overlapping (start, end, new_lines) edits into *lines*.
+
+    *edits* is in descending start order (as collected bottom-up), so it is
+    walked in reverse to build the result in a single forward pass.
+    """
+    out = []
+    prev = 0
+    for s, e, new_lines in reversed(edits):
+        out.extend(lines[prev:s])
+        out.extend(new_lines)
+        prev = e
+    out.extend(lines[prev:])
+    return out
+
+
+def _read_or_error(path):
+    """EncodingHandler.read_file result for *path*, or the exception raised."""
+    try:
+        return EncodingHandler.read_file(path)
+    except Exception as e:
+        return e
+
+
+def _write_in_place(path, backup_path, content, encoding, has_bom, line_ending):
+    """Copy *path* to *backup_path*, then overwrite *path* itself."""
+    shutil.copy2(path, backup_path)
+    EncodingHandler.write_file(path, content, encoding, has_bom, line_ending)
+
+
+def _replace_with_backup(path, backup_path, content, encoding, has_bom, line_ending):
+    """
+    Save *content* over *path*, keeping the original as *backup_path*.
+
+    The new text is written to a temp file beside *path*; the original is
+    then renamed to the backup and the temp file renamed into place, so the
+    backup costs no data copy and *path* is never left half-written. The
+    renamed-in file keeps only the permission bits of the original, not its
+    owner/group, ACLs, extended attributes or creation time.
+
+    A symlink or hard-linked *path*, or one the rename is refused for (on
+    Windows, a file another program holds open), is instead copied to the
+    backup and written in place, which keeps the link and that metadata.
+    """
+    if os.path.islink(path) or os.stat(path).st_nlink > 1:
+        _write_in_place(path, backup_path, content, encoding, has_bom, line_ending)
+        return
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.',
+                               suffix='.tmp', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        EncodingHandler.write_file(tmp, content, encoding, has_bom, line_ending)
+        shutil.copymode(path, tmp)
+        try:
+            os.replace(path, backup_path)
+        except OSError:
+            os.remove(tmp)
+            _write_in_place(path, backup_path, content, encoding, has_bom, line_ending)
+            return
+        try:
+            os.replace(tmp, path)
+        except Exception:
+            os.replace(backup_path, path)
+            raise
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@lru_cache(maxsize=512)
+def _normalize_path(path):
+    """Forward-slash form of *path* with leading/trailing slashes stripped."""
+    return path.replace('\\', '/').strip('/')
+
+
 def is_brace_language(filepath):
     """Return True if file extension is a brace-based language."""
     ext = os.path.splitext(filepath)[1].lower()
@@ -290,10 +372,16 @@ def is_brace_language(filepath):
 # ============================================================
 
 class LineDiffParser:
+    # File markers all contain '==' and commands all contain '@@'; the
+    # parse loops test for those substrings before running any regex
     RE_FILE_START = re.compile(r'^\s*={2,}\s*FILE:\s*(.+?)\s*={2,}\s*$')
     RE_FILE_END = re.compile(r'^\s*={2,}\s*END\s+FILE\s*={2,}\s*$')
     RE_CREATE_FILE = re.compile(r'^\s*={2,}\s*CREATE\s+FILE:\s*(.+?)\s*={2,}\s*$')
     RE_DELETE_FILE = re.compile(r'^\s*={2,}\s*DELETE\s+FILE:\s*(.+?)\s*={2,}\s*$')
+    # The four file markers above as one pattern; lastgroup names the kind
+    RE_FILE_MARKER = re.compile(
+        r'^\s*={2,}\s*(?:CREATE\s+FILE:\s*(?P<create>.+?)|DELETE\s+FILE:\s*(?P<delete>.+?)'
+        r'|FILE:\s*(?P<file>.+?)|(?P<end>END\s+FILE))\s*={2,}\s*$')
     RE_CMD_REPLACE = re.compile(
         r'^\s*@@\s*(\d+)\s*-\s*(\d+)\s+REPLACE\s*$', re.IGNORECASE)
     RE_CMD_DELETE = re.compile(
@@ -302,6 +390,14 @@ class LineDiffParser:
         r'^\s*@@\s*(\d+)\s+INSERT\s*$', re.IGNORECASE)
     RE_CMD_END = re.compile(
         r'^\s*@@\s*END\s*$', re.IGNORECASE)
+    # Any line that terminates a REPLACE/INSERT content block, as one pass
+    RE_CMD_BREAK = re.compile('|'.join([
+        '(?i:%s)' % RE_CMD_REPLACE.pattern,
+        '(?i:%s)' % RE_CMD_DELETE.pattern,
+        '(?i:%s)' % RE_CMD_INSERT.pattern,
+        RE_FILE_END.pattern,
+        RE_FILE_START.pattern,
+    ]))
 
     def parse(self, text):
         if not text or not text.strip():
@@ -309,9 +405,14 @@ class LineDiffParser:
         text = TextNormalizer.full(text)
         lines = text.split('\n')
 
-        file_ops = self._parse_file_ops(lines)
+        # Whole-text probes first: without any '==' there are no file
+        # markers, and without any '@@' there are no commands to collect
+        markers = self._find_markers(lines) if '==' in text else []
+        file_ops = self._parse_file_ops(lines, markers)
+        if '@@' not in text:
+            return {}, file_ops
 
-        file_blocks = self._split_files(lines)
+        file_blocks = self._split_files(lines, markers)
         if not file_blocks:
             cmds = self._parse_commands(lines)
             if cmds:
@@ -328,58 +429,70 @@ class LineDiffParser:
                     result[fp] = cmds
         return result, file_ops
 
-    def _parse_file_ops(self, lines):
-        ops = []
-        i = 0
-        while i < len(lines):
-            m = self.RE_CREATE_FILE.match(lines[i])
+    def count_tokens(self, text):
+        """Count diff markers per kind in one pass (for parse-error hints)."""
+        counts = {'file': 0, 'replace': 0, 'delete': 0, 'insert': 0, 'end': 0}
+        for line in TextNormalizer.full(text).split('\n'):
+            line = line.strip()
+            if line.startswith('='):
+                if self.RE_FILE_START.match(line):
+                    counts['file'] += 1
+            elif line.startswith('@@'):
+                if self.RE_CMD_REPLACE.match(line):
+                    counts['replace'] += 1
+                elif self.RE_CMD_DELETE.match(line):
+                    counts['delete'] += 1
+                elif self.RE_CMD_INSERT.match(line):
+                    counts['insert'] += 1
+                elif self.RE_CMD_END.match(line):
+                    counts['end'] += 1
+        return counts
+
+    def _find_markers(self, lines):
+        """(line index, kind, path) for every file marker line, in order."""
+        markers = []
+        for i, line in enumerate(lines):
+            if '==' not in line:
+                continue
+            m = self.RE_FILE_MARKER.match(line)
             if m:
-                fp = m.group(1).strip().strip('`\'"')
-                content_lines = []
-                i += 1
-                while i < len(lines):
-                    if self.RE_FILE_END.match(lines[i]):
-                        i += 1
-                        break
-                    content_lines.append(lines[i])
-                    i += 1
+                kind = m.lastgroup
+                fp = None if kind == 'end' else m.group(kind).strip().strip('`\'"')
+                markers.append((i, kind, fp))
+        return markers
+
+    def _parse_file_ops(self, lines, markers):
+        ops = []
+        k = 0
+        while k < len(markers):
+            i, kind, fp = markers[k]
+            if kind == 'create':
+                # Everything up to the next END FILE is content, markers included
+                k += 1
+                while k < len(markers) and markers[k][1] != 'end':
+                    k += 1
+                end = markers[k][0] if k < len(markers) else len(lines)
                 ops.append({
                     'op': 'create',
                     'path': fp,
-                    'content': '\n'.join(content_lines),
+                    'content': '\n'.join(lines[i + 1:end]),
                 })
-                continue
-            m = self.RE_DELETE_FILE.match(lines[i])
-            if m:
-                fp = m.group(1).strip().strip('`\'"')
+            elif kind == 'delete':
                 ops.append({'op': 'delete', 'path': fp})
-                i += 1
-                continue
-            i += 1
+            k += 1
         return ops
 
-    def _split_files(self, lines):
+    def _split_files(self, lines, markers):
         blocks = {}
-        headers = []
-        for i, line in enumerate(lines):
-            if self.RE_CREATE_FILE.match(line) or self.RE_DELETE_FILE.match(line):
-                continue
-            m = self.RE_FILE_START.match(line)
-            if m:
-                fp = m.group(1).strip().strip('`\'"')
-                headers.append((i, fp))
+        headers = [(i, fp) for i, kind, fp in markers if kind == 'file']
         if not headers:
             return {}
+        ends = [i for i, kind, fp in markers if kind == 'end']
         for hi, (hline, fp) in enumerate(headers):
             start = hline + 1
-            end_line = None
             next_header = headers[hi + 1][0] if hi + 1 < len(headers) else len(lines)
-            for j in range(start, next_header):
-                if self.RE_FILE_END.match(lines[j]):
-                    end_line = j
-                    break
-            if end_line is None:
-                end_line = next_header
+            j = bisect_left(ends, start)
+            end_line = ends[j] if j < len(ends) and ends[j] < next_header else next_header
             block = lines[start:end_line]
             if fp in blocks:
                 blocks[fp].extend(block)
@@ -392,6 +505,9 @@ class LineDiffParser:
         i = 0
         while i < len(lines):
             line = lines[i]
+            if '@@' not in line:
+                i += 1
+                continue
             m = self.RE_CMD_REPLACE.match(line)
             if m:
                 start_ln = int(m.group(1))
@@ -399,15 +515,12 @@ class LineDiffParser:
                 content_lines = []
                 i += 1
                 while i < len(lines):
-                    if self.RE_CMD_END.match(lines[i]):
-                        i += 1
-                        break
-                    if (self.RE_CMD_REPLACE.match(lines[i]) or
-                        self.RE_CMD_DELETE.match(lines[i]) or
-                        self.RE_CMD_INSERT.match(lines[i]) or
-                        self.RE_FILE_END.match(lines[i]) or
-                        self.RE_FILE_START.match(lines[i])):
-                        break
+                    if '@@' in lines[i] or '==' in lines[i]:
+                        if self.RE_CMD_END.match(lines[i]):
+                            i += 1
+                            break
+                        if self.RE_CMD_BREAK.match(lines[i]):
+                            break
                     content_lines.append(lines[i])
                     i += 1
                 commands.append({
@@ -434,15 +547,12 @@ class LineDiffParser:
                 content_lines = []
                 i += 1
                 while i < len(lines):
-                    if self.RE_CMD_END.match(lines[i]):
-                        i += 1
-                        break
-                    if (self.RE_CMD_REPLACE.match(lines[i]) or
-                        self.RE_CMD_DELETE.match(lines[i]) or
-                        self.RE_CMD_INSERT.match(lines[i]) or
-                        self.RE_FILE_END.match(lines[i]) or
-                        self.RE_FILE_START.match(lines[i])):
-                        break
+                    if '@@' in lines[i] or '==' in lines[i]:
+                        if self.RE_CMD_END.match(lines[i]):
+                            i += 1
+                            break
+                        if self.RE_CMD_BREAK.match(lines[i]):
+                            break
                     content_lines.append(lines[i])
                     i += 1
                 commands.append({
@@ -464,12 +574,19 @@ class LineDiffEngine:
     def __init__(self):
         self.parser = LineDiffParser()
         self._current_filepath = None
+        self._parse_cache = (None, None)
+        self._path_index = (None, 0, None)
 
     def parse(self, text):
-        return self.parser.parse(text)
+        # The same diff text is parsed, analyzed and applied in turn;
+        # keep the last result so it is only parsed once. Callers must
+        # treat the returned commands as read-only.
+        if self._parse_cache[0] != text:
+            self._parse_cache = (text, self.parser.parse(text))
+        return self._parse_cache[1]
 
     def analyze(self, diff_text, path_map=None):
-        parsed, file_ops = self.parser.parse(diff_text)
+        parsed, file_ops = self.parse(diff_text)
         files = []
         tc = 0
         for fp, cmds in parsed.items():
@@ -477,13 +594,13 @@ class LineDiffEngine:
             if path_map and fp != '__current_file__':
                 rp = self._resolve(fp, path_map)
                 found = rp is not None
-            rep_count = sum(1 for c in cmds if c['type'] == 'replace')
-            del_count = sum(1 for c in cmds if c['type'] == 'delete')
-            ins_count = sum(1 for c in cmds if c['type'] == 'insert')
+            kinds = {'replace': 0, 'delete': 0, 'insert': 0}
+            for c in cmds:
+                kinds[c['type']] += 1
             files.append({
                 'path': fp, 'change_count': len(cmds),
-                'rep_count': rep_count, 'del_count': del_count,
-                'ins_count': ins_count,
+                'rep_count': kinds['replace'], 'del_count': kinds['delete'],
+                'ins_count': kinds['insert'],
                 'found_in_project': found, 'resolved_path': rp})
             tc += len(cmds)
         if not parsed and not file_ops:
@@ -505,6 +622,7 @@ class LineDiffEngine:
             return original, ["[!] no changes"]
         file_lines = original.split('\n')
         orig_count = len(file_lines)
+        cur_len = orig_count
         msgs = []
         ok = 0
         errors = 0
@@ -512,6 +630,12 @@ class LineDiffEngine:
         do_brace = (self._current_filepath is not None
                     and is_brace_language(self._current_filepath))
 
+        # Edits are collected bottom-up as (start, end, new_lines) against
+        # file_lines and spliced in one forward pass by _merge_edits. Pending
+        # edits are flushed early only when a command overlaps them or a
+        # brace check needs the full text.
+        pending = []
+
         sorted_cmds = sorted(
             commands,
             key=lambda c: c.get('start', c.get('after', 0)),
@@ -523,12 +647,12 @@ class LineDiffEngine:
                 e = cmd['end']
                 if s < 0:
                     s = 0
-                if e > len(file_lines):
-                    e = len(file_lines)
-                if s > len(file_lines):
+                if e > cur_len:
+                    e = cur_len
+                if s > cur_len:
                     msgs.append(
                         "[X] REPLACE %d-%d: start(%d) > file length(%d)"
-                        % (cmd['start'], cmd['end'], cmd['start'], len(file_lines)))
+                        % (cmd['start'], cmd['end'], cmd['start'], cur_len))
                     errors += 1
                     continue
                 new_lines = cmd['content'].split('\n')
@@ -539,12 +663,15 @@ class LineDiffEngine:
                         % (cmd['start'], cmd['end'], orig_count, len(new_lines)))
                     errors += 1
                     continue
-                old_count = e - s
-                saved_old = file_lines[s:e]
-                file_lines[s:e] = new_lines
+                old_count = max(e - s, 0)
 
                 # Brace balance check after this REPLACE
                 if do_brace:
+                    if pending:
+                        file_lines = _merge_edits(file_lines, pending)
+                        pending = []
+                    saved_old = file_lines[s:e]
+                    file_lines[s:e] = new_lines
                     joined = '\n'.join(file_lines)
                     brace_ok, brace_msg = check_brace_balance(joined)
                     if not brace_ok:
@@ -558,26 +685,36 @@ class LineDiffEngine:
                             % (cmd['start'], cmd['end']))
                         errors += 1
                         continue
+                else:
+                    if pending and max(e, s) > pending[-1][0]:
+                        file_lines = _merge_edits(file_lines, pending)
+                        pending = []
+                    pending.append((s, max(e, s), new_lines))
 
+                cur_len += len(new_lines) - old_count
                 ok += 1
                 msgs.append(
                     "[OK] REPLACE %d-%d (%dlines -> %dlines)"
-                    % (cmd['start'], cmd['end'], old_count, len(new_lines)))
+                    % (cmd['start'], cmd['end'], e - s, len(new_lines)))
 
             elif ctype == 'delete':
                 s = cmd['start'] - 1
                 count = cmd['count']
                 if s < 0:
                     s = 0
-                if s >= len(file_lines):
+                if s >= cur_len:
                     msgs.append(
                         "[X] DELETE %d: start(%d) > file length(%d)"
-                        % (cmd['start'], cmd['start'], len(file_lines)))
+                        % (cmd['start'], cmd['start'], cur_len))
                     errors += 1
                     continue
-                e = min(s + count, len(file_lines))
+                e = min(s + count, cur_len)
                 actual = e - s
-                del file_lines[s:e]
+                if pending and e > pending[-1][0]:
+                    file_lines = _merge_edits(file_lines, pending)
+                    pending = []
+                pending.append((s, e, []))
+                cur_len -= actual
                 ok += 1
                 msgs.append(
                     "[OK] DELETE %d x%d (%dlines removed)"
@@ -587,15 +724,22 @@ class LineDiffEngine:
                 pos = cmd['after']
                 if pos < 0:
                     pos = 0
-                if pos > len(file_lines):
-                    pos = len(file_lines)
+                if pos > cur_len:
+                    pos = cur_len
                 new_lines = cmd['content'].split('\n')
-                file_lines[pos:pos] = new_lines
+                if pending and pos > pending[-1][0]:
+                    file_lines = _merge_edits(file_lines, pending)
+                    pending = []
+                pending.append((pos, pos, new_lines))
+                cur_len += len(new_lines)
                 ok += 1
                 msgs.append(
                     "[OK] INSERT after %d (%dlines added)"
                     % (cmd['after'], len(new_lines)))
 
+        if pending:
+            file_lines = _merge_edits(file_lines, pending)
+
         msgs.insert(0, "Result: %d ok, %d errors / %d total" % (ok, errors, len(commands)))
 
         result = '\n'.join(file_lines)
@@ -619,7 +763,7 @@ class LineDiffEngine:
         return result, msgs
 
     def resolve_and_apply_all(self, diff_text, path_map, project_path=None):
-        parsed, file_ops = self.parser.parse(diff_text)
+        parsed, file_ops = self.parse(diff_text)
         results = []
 
         for fop in file_ops:
@@ -643,7 +787,7 @@ class LineDiffEngine:
                     results.append({
                         'filepath': fp, 'resolved_path': full_path,
                         'success': True, 'new_content': fop['content'],
-                        'messages': ["[CREATED] " + fp],
+                        'op': 'create', 'messages': ["[CREATED] " + fp],
                         'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
                 except Exception as e:
                     results.append({
@@ -656,32 +800,35 @@ class LineDiffEngine:
                 fp = fop['path']
                 rp = self._resolve(fp, path_map) if path_map else None
                 if rp is None and project_path:
-                    cand = os.path.join(project_path, fp.replace('/', os.sep))
-                    if os.path.exists(cand):
-                        rp = cand
-                if rp and os.path.exists(rp):
+                    rp = os.path.join(project_path, fp.replace('/', os.sep))
+                # One stat answers both "is it there" and "is it a folder"
+                try:
+                    is_dir = stat.S_ISDIR(os.stat(rp).st_mode) if rp else None
+                except OSError:
+                    is_dir = None
+                if is_dir is not None:
                     try:
-                        if os.path.isdir(rp):
+                        # The backup sits beside the target, so deleting
+                        # is a rename rather than a copy plus removal
+                        if is_dir:
                             bp = rp + '_deleted_bak'
                             if os.path.exists(bp):
                                 shutil.rmtree(bp)
-                            shutil.copytree(rp, bp)
-                            shutil.rmtree(rp)
+                            os.replace(rp, bp)
                             results.append({
                                 'filepath': fp, 'resolved_path': rp,
                                 'success': True, 'new_content': None,
-                                'messages': [
+                                'op': 'delete', 'messages': [
                                     "[DELETED FOLDER] " + fp,
                                     "[BACKUP] " + os.path.basename(bp)],
                                 'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
                         else:
                             bp = rp + '.deleted_bak'
-                            shutil.copy2(rp, bp)
-                            os.remove(rp)
+                            os.replace(rp, bp)
                             results.append({
                                 'filepath': fp, 'resolved_path': rp,
                                 'success': True, 'new_content': None,
-                                'messages': [
+                                'op': 'delete', 'messages': [
                                     "[DELETED] " + fp,
                                     "[BACKUP] " + os.path.basename(bp)],
                                 'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
@@ -698,35 +845,50 @@ class LineDiffEngine:
                         'messages': ["[X] not found for delete: " + fp],
                         'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
 
+        # Resolve every target first, then read the files concurrently;
+        # applying stays sequential and in diff order
+        targets = []
         for fp, cmds in parsed.items():
+            rp = None
+            if fp != '__current_file__':
+                rp = self._resolve(fp, path_map)
+                if rp is None and project_path:
+                    cand = os.path.join(project_path, fp.replace('/', os.sep))
+                    if os.path.isfile(cand):
+                        rp = cand
+            targets.append((fp, cmds, rp))
+        to_read = [rp for fp, cmds, rp in targets if rp is not None]
+        reads = {}
+        if to_read:
+            with ThreadPoolExecutor(max_workers=min(8, len(to_read))) as ex:
+                reads = dict(zip(to_read, ex.map(_read_or_error, to_read)))
+
+        # One slot per target, filled by index
+        edits = [None] * len(targets)
+        for i, (fp, cmds, rp) in enumerate(targets):
             if fp == '__current_file__':
-                results.append({
+                edits[i] = {
                     'filepath': fp, 'resolved_path': None,
                     'success': False, 'new_content': None,
                     'messages': ["file not specified -> use 'apply to current file'"],
-                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
+                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'}
                 continue
-            rp = self._resolve(fp, path_map)
-            if rp is None and project_path:
-                cand = os.path.join(project_path, fp.replace('/', os.sep))
-                if os.path.isfile(cand):
-                    rp = cand
             if rp is None:
-                results.append({
+                edits[i] = {
                     'filepath': fp, 'resolved_path': None,
                     'success': False, 'new_content': None,
                     'messages': ["[X] not found: " + fp],
-                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
+                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'}
                 continue
-            try:
-                content, enc, bom, le = EncodingHandler.read_file(rp)
-            except Exception as e:
-                results.append({
+            read = reads[rp]
+            if isinstance(read, Exception):
+                edits[i] = {
                     'filepath': fp, 'resolved_path': rp,
                     'success': False, 'new_content': None,
-                    'messages': ["[X] read error: " + str(e)],
-                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'})
+                    'messages': ["[X] read error: " + str(read)],
+                    'encoding': 'utf-8', 'has_bom': False, 'line_ending': '\n'}
                 continue
+            content, enc, bom, le = read
 
             self._current_filepath = rp
             new_c, msgs = self.apply_to_content(content, cmds)
@@ -734,12 +896,13 @@ class LineDiffEngine:
 
             any_ok = any('[OK]' in m for m in msgs)
             changed = new_c != content
-            results.append({
+            edits[i] = {
                 'filepath': fp, 'resolved_path': rp,
                 'success': any_ok and changed,
                 'new_content': new_c if changed else None,
                 'messages': msgs, 'encoding': enc,
-                'has_bom': bom, 'line_ending': le})
+                'has_bom': bom, 'line_ending': le}
+        results.extend(edits)
         return results
 
     def apply_and_save(self, diff_text, path_map, project_path=None):
@@ -747,7 +910,9 @@ class LineDiffEngine:
         saved, failed, skipped, created, deleted = 0, 0, 0, 0, 0
         brace_blocked = 0
         for r in results:
-            if any('[CREATED]' in m for m in r['messages']):
+            # Completed file ops are tagged when their result is built,
+            # so the messages need not be searched for markers
+            if r.get('op') == 'create':
                 if r['success']:
                     created += 1
                     if r.get('resolved_path', '').endswith('.py'):
@@ -761,7 +926,7 @@ class LineDiffEngine:
                 else:
                     failed += 1
                 continue
-            if any("[DELETED" in m for m in r["messages"]):
+            if r.get('op') == 'delete':
                 if r['success']:
                     deleted += 1
                 else:
@@ -775,13 +940,6 @@ class LineDiffEngine:
                     skipped += 1
                 continue
             try:
-                bp = r['resolved_path'] + '.bak'
-                n = 1
-                while os.path.exists(bp):
-                    bp = r['resolved_path'] + '.bak' + str(n)
-                    n += 1
-                shutil.copy2(r['resolved_path'], bp)
-
                 fext = os.path.splitext(r['resolved_path'])[1].lower()
                 if fext in BRACE_LANGUAGES:
                     brace_ok, brace_msg = check_brace_balance(r['new_content'])
@@ -793,8 +951,13 @@ class LineDiffEngine:
                         failed += 1
                         continue
 
-                EncodingHandler.write_file(
-                    r['resolved_path'], r['new_content'],
+                bp = r['resolved_path'] + '.bak'
+                n = 1
+                while os.path.exists(bp):
+                    bp = r['resolved_path'] + '.bak' + str(n)
+                    n += 1
+                _replace_with_backup(
+                    r['resolved_path'], bp, r['new_content'],
                     r['encoding'], r['has_bom'], r['line_ending'])
                 r['messages'].append("[SAVED] backup: " + os.path.basename(bp))
                 saved += 1
@@ -816,34 +979,72 @@ class LineDiffEngine:
             'created': created, 'deleted': deleted,
             'brace_blocked': brace_blocked}
 
+    def _index_paths(self, pm):
+        """
+        Lookup tables for *pm*, built once per path map.
+
+        The same map is passed to analyze() and then to the apply, so the
+        tables are kept until a different (or resized) map comes in.
+        """
+        cached_pm, cached_len, index = self._path_index
+        if cached_pm is pm and cached_len == len(pm):
+            return index
+        exact, lower, by_name, loose = {}, {}, {}, {}
+        for i, (r, a) in enumerate(pm.items()):
+            norm = _normalize_path(r)
+            nl = norm.lower()
+            exact.setdefault(norm, a)
+            lower.setdefault(nl, a)
+            parts = nl.split('/')
+            by_name.setdefault(parts[-1], []).append((parts, a))
+            loose.setdefault(r.replace('\\', '/').lower(), (i, a))
+        # Loose keys sorted by their reversed text: the keys ending with a
+        # given string form one contiguous run
+        rev = sorted((rl[::-1], hit) for rl, hit in loose.items())
+        rev_keys = [k for k, hit in rev]
+        rev_hits = [hit for k, hit in rev]
+        index = (exact, lower, by_name, (loose, rev_keys, rev_hits), {})
+        self._path_index = (pm, len(pm), index)
+        return index
+
     def _resolve(self, fp, pm):
         if not fp or not pm:
             return None
-        norm = fp.replace('\\', '/').strip('/')
+        index = self._index_paths(pm)
+        # analyze() and the apply resolve the same names against the same
+        # map; answer repeats from the per-map memo
+        memo = index[-1]
+        if fp not in memo:
+            memo[fp] = self._lookup(fp, index)
+        return memo[fp]
+
+    @staticmethod
+    def _lookup(fp, index):
+        exact, lower, by_name, (loose, rev_keys, rev_hits), _ = index
+        norm = _normalize_path(fp)
+        if norm in exact:
+            return exact[norm]
         nl = norm.lower()
-        for r, a in pm.items():
-            if r.replace('\\', '/').strip('/') == norm:
-                return a
-        for r, a in pm.items():
-            if r.replace('\\', '/').strip('/').lower() == nl:
-                return a
-        fn = nl.split('/')[-1]
-        cands = [(r, a) for r, a in pm.items()
-                 if r.replace('\\', '/').split('/')[-1].lower() == fn]
+        if nl in lower:
+            return lower[nl]
+        np = nl.split('/')
+        cands = by_name.get(np[-1], ())
         if len(cands) == 1:
             return cands[0][1]
         if len(cands) > 1:
             best, bo = None, 0
-            for r, a in cands:
-                rp = r.replace('\\', '/').lower().split('/')
-                np = nl.split('/')
+            for rp, a in cands:
                 ov = sum(1 for x, y in zip(reversed(rp), reversed(np)) if x == y)
                 if ov > bo:
                     bo, best = ov, a
             if best:
                 return best
-        for r, a in pm.items():
-            rl = r.replace('\\', '/').lower()
-            if rl.endswith(nl) or nl.endswith(rl):
-                return a
-        return None
+        # Last resort: the first map entry whose key ends with the path,
+        # or that the path ends with
+        hits = [loose[nl[k:]] for k in range(len(nl) + 1) if nl[k:] in loose]
+        rn = nl[::-1]
+        j = bisect_left(rev_keys, rn)
+        while j < len(rev_keys) and rev_keys[j].startswith(rn):
+            hits.append(rev_hits[j])
+            j += 1
+        return min(hits)[1] if hits else None
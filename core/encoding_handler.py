@@ -5,7 +5,9 @@ encoding_handler.py — Encoding detection and text normalization for ProjectSca
 """
 
 import os
+import threading
 import unicodedata
+from collections import OrderedDict
 
 
 class EncodingHandler:
@@ -16,59 +18,124 @@ class EncodingHandler:
 
     @staticmethod
     def detect_encoding(file_path):
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        return EncodingHandler.detect_encoding_bytes(raw)
+
+    @staticmethod
+    def _candidates(raw):
+        # utf-8-sig decodes BOM-less UTF-8 too; only offer it when a BOM
+        # is really there so saving does not add one
+        if raw[:3] == b'\xef\xbb\xbf':
+            return EncodingHandler.ENCODING_CANDIDATES
+        return [e for e in EncodingHandler.ENCODING_CANDIDATES if e != 'utf-8-sig']
+
+    @staticmethod
+    def detect_encoding_bytes(raw):
+        return EncodingHandler._sniff(raw)[0]
+
+    @staticmethod
+    def _sniff(raw, hint=None):
+        """(encoding, text) for *raw*; text is None unless detection decoded it."""
+        if raw[:3] == b'\xef\xbb\xbf':
+            return 'utf-8-sig', None
+        if raw[:2] in (b'\xff\xfe', b'\xfe\xff'):
+            return 'utf-16', None
+        # Valid UTF-8 (ASCII included) is settled by one C-level decode,
+        # before any slower guessing
         try:
-            with open(file_path, 'rb') as f:
-                raw = f.read(4)
-            if raw[:3] == b'\xef\xbb\xbf':
-                return 'utf-8-sig'
-            if raw[:2] in (b'\xff\xfe', b'\xfe\xff'):
-                return 'utf-16'
-        except Exception:
+            return 'utf-8', raw.decode('utf-8')
+        except UnicodeDecodeError:
             pass
+        # The encoding this file decoded with last time is tried before
+        # any statistical guess
+        if hint:
+            try:
+                return hint, raw.decode(hint)
+            except (UnicodeDecodeError, UnicodeError, LookupError):
+                pass
         try:
             import chardet
-            with open(file_path, 'rb') as f:
-                data = f.read(min(os.path.getsize(file_path), 65536))
-            det = chardet.detect(data)
+            det = chardet.detect(raw[:65536])
             if det and det.get('confidence', 0) > 0.7:
                 enc = det['encoding']
                 if enc and enc.lower().replace('-', '') in ('euckr', 'iso2022kr'):
-                    return 'cp949'
+                    return 'cp949', None
                 if enc:
-                    return enc.lower()
+                    return enc.lower(), None
         except ImportError:
             pass
-        for enc in EncodingHandler.ENCODING_CANDIDATES:
+        for enc in EncodingHandler._candidates(raw):
+            if enc == 'utf-8':
+                continue
             try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    f.read()
-                return enc
+                return enc, raw.decode(enc)
             except (UnicodeDecodeError, UnicodeError):
                 continue
-        return 'latin-1'
+        return 'latin-1', None
+
+    # path -> legacy (non-UTF, non-latin-1) encoding it last decoded with,
+    # most recent last; bounded like _read_cache and guarded by its lock
+    _last_encoding = OrderedDict()
 
     @staticmethod
     def read_file(file_path):
-        encoding = EncodingHandler.detect_encoding(file_path)
-        has_bom = encoding == 'utf-8-sig'
         with open(file_path, 'rb') as f:
             raw = f.read()
+        with EncodingHandler._read_cache_lock:
+            hint = EncodingHandler._last_encoding.get(file_path)
+        encoding, content = EncodingHandler._sniff(raw, hint)
         crlf = raw.count(b'\r\n')
         lf = raw.count(b'\n') - crlf
         line_ending = '\r\n' if crlf > lf else '\n'
-        for enc in ([encoding] + EncodingHandler.ENCODING_CANDIDATES):
-            try:
-                content = raw.decode(enc)
-                encoding = enc
-                has_bom = enc == 'utf-8-sig'
-                break
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-        else:
-            content = raw.decode('latin-1')
-            encoding = 'latin-1'
+        if content is None:
+            for enc in ([encoding] + EncodingHandler._candidates(raw)):
+                try:
+                    content = raw.decode(enc)
+                    encoding = enc
+                    break
+                except (UnicodeDecodeError, UnicodeError):
+                    continue
+            else:
+                content = raw.decode('latin-1')
+                encoding = 'latin-1'
+        memo = EncodingHandler._last_encoding
+        with EncodingHandler._read_cache_lock:
+            if encoding.startswith(('utf', 'latin')):
+                # A hint that no longer applies is dropped, not kept around
+                memo.pop(file_path, None)
+            else:
+                memo[file_path] = encoding
+                memo.move_to_end(file_path)
+                while len(memo) > EncodingHandler.READ_CACHE_SIZE:
+                    memo.popitem(last=False)
+        has_bom = encoding == 'utf-8-sig'
         return content, encoding, has_bom, line_ending
 
+    # path -> ((mtime_ns, size), read_file result), most recent last
+    _read_cache = OrderedDict()
+    _read_cache_lock = threading.Lock()
+    READ_CACHE_SIZE = 64
+
+    @staticmethod
+    def read_file_cached(file_path):
+        """read_file, reusing the last result while mtime and size are unchanged."""
+        st = os.stat(file_path)
+        key = (st.st_mtime_ns, st.st_size)
+        cache = EncodingHandler._read_cache
+        with EncodingHandler._read_cache_lock:
+            hit = cache.get(file_path)
+            if hit and hit[0] == key:
+                cache.move_to_end(file_path)
+                return hit[1]
+        result = EncodingHandler.read_file(file_path)
+        with EncodingHandler._read_cache_lock:
+            cache[file_path] = (key, result)
+            cache.move_to_end(file_path)
+            while len(cache) > EncodingHandler.READ_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
+
     @staticmethod
     def write_file(file_path, content, encoding='utf-8',
                    has_bom=False, line_ending='\n'):
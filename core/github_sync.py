@@ -6,17 +6,32 @@ Handles git init, commit, push, rollback.
 """
 
 import os
+import re
 import subprocess
 import tempfile
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 
+def _write_text(path, text):
+    """Write *text* as UTF-8 with the platform's line endings."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
 class GitHubUploader:
     GH_PATH = r'"C:\Program Files\GitHub CLI\gh.exe"'
+    RE_REPO_URL = re.compile(r'https://github\.com/\S+')
+
+    CHECK_TTL = 30.0
+    GITIGNORE = "*.bak\n*.bak*\n__pycache__/\n.vs/\n"
 
     def __init__(self, log_cb=None):
         self.log = log_cb or print
+        self._checked_ok = {}  # probe command -> time it last succeeded
 
     def run_cmd(self, cmd, cwd=None):
         self.log(f"$ {cmd}")
@@ -35,11 +50,27 @@ class GitHubUploader:
             self.log(f"ERROR: {e}")
             return False, '', str(e)
 
+    def _probe(self, cmd):
+        """Exit-status-only check; output is discarded, successes cached briefly."""
+        t = self._checked_ok.get(cmd)
+        if t is not None and time.monotonic() - t < self.CHECK_TTL:
+            return True
+        self.log(f"$ {cmd}")
+        try:
+            ok = subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, timeout=60).returncode == 0
+        except Exception as e:
+            self.log(f"ERROR: {e}")
+            return False
+        if ok:
+            self._checked_ok[cmd] = time.monotonic()
+        return ok
+
     def check_git(self):
-        ok, *_ = self.run_cmd('git --version'); return ok
+        return self._probe('git --version')
 
     def check_gh(self):
-        ok, *_ = self.run_cmd(f'{self.GH_PATH} --version'); return ok
+        return self._probe(f'{self.GH_PATH} --version')
 
     def check_auth(self):
         ok, out, err = self.run_cmd(f'{self.GH_PATH} auth status')
@@ -51,7 +82,8 @@ class GitHubUploader:
 
     def create_and_push(self, files, project_path, repo_name,
                         private=True, desc='', progress_cb=None):
-        td = tempfile.mkdtemp(prefix='projectscan_')
+        staging = tempfile.TemporaryDirectory(prefix='projectscan_')
+        td = staging.name
         try:
             total = len(files) + 5
             step = 0
@@ -59,17 +91,38 @@ class GitHubUploader:
                 nonlocal step; step += 1
                 if progress_cb: progress_cb(step / total * 100)
             self.log(f"temp dir: {td}")
+            # Hard-link into the staging dir where possible (same volume);
+            # fall back to copying once linking is refused
+            can_link = hasattr(os, 'link')
+            made = set()
+            to_copy = []
             for rel, full, *_ in files:
                 dst = os.path.join(td, rel.replace('/', os.sep))
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copy2(full, dst)
+                d = os.path.dirname(dst)
+                if d not in made:
+                    os.makedirs(d, exist_ok=True)
+                    made.add(d)
+                if can_link:
+                    try:
+                        os.link(full, dst)
+                        continue
+                    except OSError:
+                        can_link = False
+                to_copy.append((full, dst))
+            if to_copy:
+                # Real copies are I/O bound; overlap them in a small pool
+                with ThreadPoolExecutor(max_workers=min(8, len(to_copy))) as ex:
+                    for _ in ex.map(lambda job: shutil.copy2(*job), to_copy):
+                        pass
             prog()
-            with open(os.path.join(td, 'README.md'), 'w', encoding='utf-8') as f:
-                f.write(f"# {repo_name}\n\n{desc}\n\nFiles: {len(files)}\n\nUploaded by ProjectScan\n")
+            readme = os.path.join(td, 'README.md')
+            if os.path.exists(readme):
+                # may be a link to the project's own README; never write through it
+                os.remove(readme)
+            _write_text(readme, f"# {repo_name}\n\n{desc}\n\nFiles: {len(files)}\n\nUploaded by ProjectScan\n")
             gi_path = os.path.join(td, '.gitignore')
             if not os.path.exists(gi_path):
-                with open(gi_path, 'w', encoding='utf-8') as f:
-                    f.write("*.bak\n*.bak*\n__pycache__/\n.vs/\n")
+                _write_text(gi_path, self.GITIGNORE)
             prog()
             self.run_cmd('git init', cwd=td)
             self.run_cmd('git add -A', cwd=td)
@@ -82,6 +135,11 @@ class GitHubUploader:
                 cwd=td)
             prog()
             if ok:
+                # gh prints the new repo URL; only ask again if it did not
+                m = self.RE_REPO_URL.search(out) or self.RE_REPO_URL.search(err)
+                if m:
+                    url = m.group(0)
+                    return True, url[:-4] if url.endswith('.git') else url
                 ok2, url, _ = self.run_cmd(
                     f'{self.GH_PATH} repo view {repo_name} --json url -q .url',
                     cwd=td)
@@ -90,10 +148,14 @@ class GitHubUploader:
         except Exception as e:
             return False, str(e)
         finally:
-            try:
-                shutil.rmtree(td, ignore_errors=True)
-            except Exception:
-                pass
+            # Removing the staged tree (with its read-only .git objects on
+            # Windows) can take seconds; do it off the upload's critical path
+            def cleanup():
+                try:
+                    staging.cleanup()
+                except OSError:
+                    pass
+            threading.Thread(target=cleanup, daemon=True).start()
 
     def init_local_repo(self, project_path, repo_name):
         """Initialize local git repo and set remote if needed."""
@@ -102,8 +164,7 @@ class GitHubUploader:
             self.run_cmd('git init', cwd=project_path)
             gi_path = os.path.join(project_path, '.gitignore')
             if not os.path.exists(gi_path):
-                with open(gi_path, 'w', encoding='utf-8') as f:
-                    f.write("*.bak\n*.bak*\n__pycache__/\n.vs/\n")
+                _write_text(gi_path, self.GITIGNORE)
             self.run_cmd('git add -A', cwd=project_path)
             self.run_cmd('git commit -m "init by ProjectScan"', cwd=project_path)
         ok, out, _ = self.run_cmd('git remote get-url origin', cwd=project_path)
@@ -11,9 +11,14 @@ import sys
 import io
 import json
 import shutil
+import stat
 import hashlib
+import fnmatch
 import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
 
 import tkinter as tk
@@ -27,8 +32,8 @@ if sys.stderr and hasattr(sys.stderr, 'buffer'):
 
 # Import from core package
 from core import (
-    EncodingHandler, TextNormalizer,
-    LineDiffParser, LineDiffEngine,
+    EncodingHandler,
+    LineDiffEngine,
     GitHubUploader,
     CheckboxTreeview,
     CodeEditor,
@@ -36,6 +41,186 @@ from core import (
 )
 
 
+# Format instructions appended after the file count in Merge & Copy
+ATTACH_RULES = (
+    "",
+    "```",
+    "=== FILE: relative/path/file.ext ===",
+    "## CONTEXT: line 14 | old_code_before_change",
+    "@@ 15-23 REPLACE",
+    "new code for lines 15 to 23",
+    "@@ END",
+    "## VERIFY: line 24 | old_code_after_change",
+    "@@ 50 DELETE 3",
+    "@@ 60 INSERT",
+    "code to insert after line 60",
+    "@@ END",
+    "=== END FILE ===",
+    "```",
+    "",
+    "=== CRITICAL RULES (violations will cause code corruption) ===",
+    "",
+    "1. LINE NUMBER ACCURACY:",
+    "   - Line numbers MUST match the ORIGINAL file exactly (shown as N| prefix)",
+    "   - ALWAYS verify the line number by checking the content at that line",
+    "   - If unsure about a line number, find the exact content first",
+    "",
+    "2. CONTEXT VERIFICATION (MANDATORY):",
+    "   - Before each @@ command, add a ## CONTEXT comment showing the line BEFORE the change:",
+    "     ## CONTEXT: line 14 | def existing_function():  ",
+    "     @@ 15-23 REPLACE",
+    "   - After each @@ END, add a ## VERIFY comment showing the line AFTER the change:",
+    "     @@ END",
+    "     ## VERIFY: line 24 | return result",
+    "   - These comments prove you checked the correct location",
+    "",
+    "3. ORDERING & SAFETY:",
+    "   - When making multiple changes to ONE file, list them from BOTTOM to TOP",
+    "     (highest line numbers first) to prevent line-number drift",
+    "   - NEVER modify more than 50 lines in a single REPLACE block",
+    "   - If changing >50 lines, split into multiple smaller REPLACE blocks",
+    "",
+    "4. INDENTATION & SYNTAX:",
+    "   - Preserve the EXACT indentation style of the original file (spaces vs tabs)",
+    "   - For Python: ensure consistent indentation (4 spaces per level)",
+    "   - The replacement code MUST be syntactically valid on its own",
+    "   - Do NOT leave unclosed brackets, parentheses, or string literals",
+    "",
+    "5. COMPLETENESS:",
+    "   - Include ALL lines in the replacement range, even unchanged ones",
+    "   - Do NOT use '...' or '# rest unchanged' — write every line explicitly",
+    "   - @@ START-END REPLACE : replace lines START through END with new content",
+    "   - @@ N DELETE COUNT : delete COUNT lines starting from line N",
+    "   - @@ N INSERT : insert new content AFTER line N (use 0 to insert at top)",
+    "   - Each REPLACE/INSERT block must end with @@ END",
+    "",
+    "6. FORMAT:",
+    "   - Do NOT use SEARCH/REPLACE blocks. Use ONLY @@ line commands",
+    "   - After all changes, state the REASON for each modification",
+    "   - The reason will be used as a GitHub commit message",
+    "",
+    "=== END RULES ===",
+    "---",
+)
+
+
+# Project item types whose Include paths the VS scan collects
+PROJ_ITEM_TAGS = (
+    'Compile', 'Content', 'None', 'TypeScriptCompile',
+    'ClCompile', 'ClInclude', 'Page', 'Resource',
+    'ApplicationDefinition', 'EmbeddedResource')
+PROJ_EXTS = ('.csproj', '.vbproj', '.fsproj', '.vcxproj')
+
+
+_LN_PREFIXES = []
+LN_PREFIX_CACHE = 20000  # lines whose prefixes are kept for reuse
+
+
+def _line_prefixes(n):
+    """
+    '   N| ' prefixes for lines 1..n (at least).
+
+    The first LN_PREFIX_CACHE are built once and reused; prefixes past
+    that are formatted on the fly so the cache stays bounded.
+    """
+    have = len(_LN_PREFIXES)
+    if have < min(n, LN_PREFIX_CACHE):
+        _LN_PREFIXES.extend('%4d| ' % i
+                            for i in range(have + 1, min(n, LN_PREFIX_CACHE) + 1))
+    if n <= LN_PREFIX_CACHE:
+        return _LN_PREFIXES
+    return chain(_LN_PREFIXES,
+                 ('%4d| ' % i for i in range(LN_PREFIX_CACHE + 1, n + 1)))
+
+
+def _name_matcher(patterns):
+    """
+    Case-insensitive test of a file or folder name against *patterns*.
+
+    Plain names are a set lookup and '*.ext'-style patterns one endswith
+    call; only the remaining globs go through a regex.
+    """
+    def is_glob(p):
+        return any(c in p for c in '*?[')
+    names = frozenset(p.lower() for p in patterns if not is_glob(p))
+    suffixes = tuple(p[1:].lower() for p in patterns
+                     if p.startswith('*') and not is_glob(p[1:]))
+    globs = [p for p in patterns
+             if is_glob(p) and not (p.startswith('*') and not is_glob(p[1:]))]
+    glob_re = (re.compile('|'.join(fnmatch.translate(p) for p in globs), re.IGNORECASE)
+               if globs else None)
+
+    def match(name):
+        low = name.lower()
+        return (low in names or low.endswith(suffixes)
+                or (glob_re is not None and glob_re.match(name) is not None))
+    return match
+
+
+def _read_attachment(path):
+    """Text of *path* for Merge & Copy, or a placeholder if it cannot be read."""
+    try:
+        return EncodingHandler.read_file_cached(path)[0]
+    except Exception:
+        return "(read error)"
+
+
+def _scan_dir(path, excluded, exts, max_bytes):
+    """
+    One directory of a folder scan: ([(full, size)...], [subdirs...]).
+
+    Sizes come from the DirEntry stat, so each file costs one stat call.
+    Symlinked directories are listed but not descended into, as os.walk does.
+    """
+    files, subdirs = [], []
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return files, subdirs
+    with it:
+        for entry in it:
+            if excluded(entry.name):
+                continue
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in exts:
+                    continue
+                sz = entry.stat().st_size
+            except OSError:
+                continue
+            if sz <= max_bytes:
+                files.append((entry.path, sz))
+    return files, subdirs
+
+
+def _find_projects(root, excluded):
+    """VS project files under *root*, shallowest first, skipping excluded folders."""
+    projs = []
+    level = [root]
+    while level:
+        nxt = []
+        for path in level:
+            try:
+                it = os.scandir(path)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink() and not excluded(entry.name):
+                                nxt.append(entry.path)
+                        elif entry.name.endswith(PROJ_EXTS):
+                            projs.append(entry.path)
+                    except OSError:
+                        continue
+        level = nxt
+    return projs
+
+
 # ════════════════════════════════════════════════════════════
 #  ProjectScan v6.0 — Main Application
 # ════════════════════════════════════════════════════════════
@@ -55,6 +240,10 @@ class ProjectScan:
         self.auto_sync = tk.BooleanVar(value=False)
         self.commit_msg_var = tk.StringVar(value="update by ProjectScan")
         self.all_files = []
+        self._tree_files = {}  # tree item id -> (rel, full, size) for file rows
+        self._scan_seq = 0
+        self._scanned_files = []  # last scan before the SrcOnly filter
+        self._path_map = (None, {})  # (all_files it was built from, rel -> full)
         self._current_file_path = None
 
         self.source_only_ext = {
@@ -77,11 +266,14 @@ class ProjectScan:
         self.sensitive_patterns = [
             '*.env','.env','*.pem','*.key','*.pfx','id_rsa','*password*',
             '*secret*','appsettings.Development.json','secrets.json','web.config']
+        self._is_excluded = _name_matcher(self.exclude_patterns)
+        self._is_sensitive = _name_matcher(self.sensitive_patterns)
 
         self.diff_engine = LineDiffEngine()
         self.uploader = GitHubUploader()
         self.code_reviewer = CodeReviewer(max_line_length=120)
         self._last_saved_files = []
+        self._last_preview = None
         self._setup_styles()
         self._build_ui()
 
@@ -103,7 +295,8 @@ class ProjectScan:
         ttk.Label(top, textvariable=self.project_path, style='Dark.TLabel').pack(side='left', padx=5, fill='x', expand=True)
         ttk.Label(top, text="MaxKB:", style='Dark.TLabel').pack(side='left')
         ttk.Spinbox(top, from_=10, to=5000, textvariable=self.max_file_size, width=6).pack(side='left', padx=2)
-        ttk.Checkbutton(top, text="SrcOnly", variable=self.source_only, style='Dark.TCheckbutton').pack(side='left', padx=5)
+        ttk.Checkbutton(top, text="SrcOnly", variable=self.source_only, style='Dark.TCheckbutton',
+                        command=self._on_source_only_changed).pack(side='left', padx=5)
 
         scan_bar = ttk.Frame(self.root, style='Dark.TFrame')
         scan_bar.pack(fill='x', padx=5, pady=2)
@@ -147,9 +340,12 @@ class ProjectScan:
         self.diff_log_label.pack(fill='x', padx=3, pady=2)
         diff_btns = ttk.Frame(tab_diff, style='Dark.TFrame')
         diff_btns.pack(fill='x', padx=3, pady=2)
-        ttk.Button(diff_btns, text="[Analyze]", style='Dark.TButton', command=self._analyze_diff).pack(side='left', padx=2)
-        ttk.Button(diff_btns, text="[Apply to Current]", style='Accent.TButton', command=self._apply_diff_current).pack(side='left', padx=2)
-        ttk.Button(diff_btns, text="[Multi-file Apply+Save]", style='Accent.TButton', command=self._apply_multi_diff).pack(side='left', padx=2)
+        self._diff_buttons = [
+            ttk.Button(diff_btns, text="[Analyze]", style='Dark.TButton', command=self._analyze_diff),
+            ttk.Button(diff_btns, text="[Apply to Current]", style='Accent.TButton', command=self._apply_diff_current),
+            ttk.Button(diff_btns, text="[Multi-file Apply+Save]", style='Accent.TButton', command=self._apply_multi_diff)]
+        for b in self._diff_buttons:
+            b.pack(side='left', padx=2)
         self.notebook.add(tab_diff, text=' Diff ')
 
         # Tab 3: Prompt
@@ -220,19 +416,6 @@ class ProjectScan:
             self.project_path.set(p)
             self.status_var.set("folder: " + p)
 
-    def _should_exclude(self, name):
-        for pat in self.exclude_patterns:
-            if pat.startswith('*') and name.lower().endswith(pat[1:].lower()):
-                return True
-            if name.lower() == pat.lower():
-                return True
-        return False
-
-    def _is_target(self, path):
-        ext = os.path.splitext(path)[1].lower()
-        exts = self.source_only_ext if self.source_only.get() else self.all_code_ext
-        return ext in exts
-
     def _format_size(self, size):
         if size < 1024: return f"{size} B"
         if size < 1024 * 1024: return f"{size / 1024:.1f} KB"
@@ -242,103 +425,172 @@ class ProjectScan:
         pp = self.project_path.get()
         if not pp:
             messagebox.showwarning("warning", "select folder first"); return
-        self.all_files = []
+        # Tk variables are read here; the walk itself runs off the UI thread.
+        # All code files are collected so SrcOnly can be toggled without a rescan
+        exts = self.all_code_ext
         max_kb = self.max_file_size.get() * 1024
-        for dirpath, dirnames, filenames in os.walk(pp):
-            dirnames[:] = [d for d in dirnames if not self._should_exclude(d)]
-            for fn in filenames:
-                if self._should_exclude(fn): continue
-                fp = os.path.join(dirpath, fn)
-                if not self._is_target(fp): continue
-                try: sz = os.path.getsize(fp)
-                except OSError: continue
-                if sz > max_kb: continue
-                self.all_files.append((os.path.relpath(fp, pp), fp, sz))
+        self._scan_seq += 1
+        seq = self._scan_seq
+        self.status_var.set("scanning...")
+
+        def do_scan():
+            found = []
+            level = [pp]
+            with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as ex:
+                while level:
+                    nxt = []
+                    for files, subdirs in ex.map(
+                            lambda d: _scan_dir(d, self._is_excluded, exts, max_kb), level):
+                        found.extend(files)
+                        nxt.extend(subdirs)
+                    level = nxt
+            all_files = [(os.path.relpath(fp, pp), fp, sz) for fp, sz in found]
+            self.root.after(0, lambda: self._finish_scan(seq, all_files))
+
+        threading.Thread(target=do_scan, daemon=True).start()
+
+    def _finish_scan(self, seq, all_files):
+        if seq != self._scan_seq:
+            return  # a newer scan was started
+        self._scanned_files = all_files
+        self.all_files = self._filter_source_only(all_files)
         self._populate_tree()
         self.status_var.set(f"scan done: {len(self.all_files)} files")
 
+    def _filter_source_only(self, files):
+        if not self.source_only.get():
+            return list(files)
+        exts = self.source_only_ext
+        return [f for f in files if os.path.splitext(f[1])[1].lower() in exts]
+
+    def _on_source_only_changed(self):
+        if not self._scanned_files:
+            return
+        self.all_files = self._filter_source_only(self._scanned_files)
+        self._populate_tree()
+        self.status_var.set(f"filtered: {len(self.all_files)} files")
+
     def _scan_vs(self):
         pp = self.project_path.get()
         if not pp:
             messagebox.showwarning("warning", "select folder first"); return
-        projs = []
-        for fn in os.listdir(pp):
-            fp = os.path.join(pp, fn)
-            if fn.endswith(('.csproj', '.vbproj', '.fsproj', '.vcxproj')):
-                projs.append(fp)
-        for dirpath, dirnames, filenames in os.walk(pp):
-            dirnames[:] = [d for d in dirnames if not self._should_exclude(d)]
-            for fn in filenames:
-                fp = os.path.join(dirpath, fn)
-                if fn.endswith(('.csproj', '.vbproj', '.fsproj', '.vcxproj')):
-                    if fp not in projs: projs.append(fp)
-        if not projs:
-            messagebox.showinfo("VS project", "no VS project found")
-            self._scan_folder(); return
-
-        self.all_files = []
         max_kb = self.max_file_size.get() * 1024
-        collected = set()
-        for proj_file in projs:
-            proj_dir = os.path.dirname(proj_file)
-            try:
-                tree = ET.parse(proj_file)
-                xroot = tree.getroot()
-                ns = ''
-                if xroot.tag.startswith('{'):
-                    ns = xroot.tag.split('}')[0] + '}'
-                for tag in ['Compile','Content','None','TypeScriptCompile',
-                            'ClCompile','ClInclude','Page','Resource',
-                            'ApplicationDefinition','EmbeddedResource']:
-                    for elem in xroot.iter(f'{ns}{tag}'):
+        exts = self.all_code_ext
+        self._scan_seq += 1  # a folder scan still running is now stale
+        seq = self._scan_seq
+        self.status_var.set("scanning VS projects...")
+
+        def do_scan():
+            projs = _find_projects(pp, self._is_excluded)
+            files = []
+            probed = set()  # Include paths already checked, kept or not
+            qualified = {}  # xml namespace -> item tags in that namespace
+            for proj_file in projs:
+                proj_dir = os.path.dirname(proj_file)
+                try:
+                    tree = ET.parse(proj_file)
+                    xroot = tree.getroot()
+                    ns = ''
+                    if xroot.tag.startswith('{'):
+                        ns = xroot.tag.split('}')[0] + '}'
+                    tags = qualified.get(ns)
+                    if tags is None:
+                        tags = qualified[ns] = frozenset(ns + t for t in PROJ_ITEM_TAGS)
+                    # One walk over the project, picking out the wanted item types
+                    for elem in xroot.iter():
+                        if elem.tag not in tags: continue
                         inc = elem.get('Include')
                         if inc:
                             fp = os.path.normpath(os.path.join(proj_dir, inc))
-                            if os.path.isfile(fp) and fp not in collected and self._is_target(fp):
-                                try: sz = os.path.getsize(fp)
-                                except OSError: continue
-                                if sz <= max_kb:
-                                    self.all_files.append((os.path.relpath(fp, pp), fp, sz))
-                                    collected.add(fp)
-            except: continue
+                            if fp in probed: continue
+                            probed.add(fp)
+                            if os.path.splitext(fp)[1].lower() not in exts: continue
+                            # one stat answers both "is it a file" and its size
+                            try: st = os.stat(fp)
+                            except OSError: continue
+                            if stat.S_ISREG(st.st_mode) and st.st_size <= max_kb:
+                                files.append((os.path.relpath(fp, pp), fp, st.st_size))
+                except: continue
+            self.root.after(0, lambda: self._finish_vs_scan(seq, bool(projs), files))
+
+        threading.Thread(target=do_scan, daemon=True).start()
+
+    def _finish_vs_scan(self, seq, found_projects, files):
+        if seq != self._scan_seq:
+            return  # a newer scan was started
+        if not found_projects:
+            messagebox.showinfo("VS project", "no VS project found")
+            self._scan_folder(); return
+        self._scanned_files = files
+        self.all_files = self._filter_source_only(files)
         if not self.all_files:
             self._scan_folder(); return
         self._populate_tree()
         self.status_var.set(f"VS scan: {len(self.all_files)} files")
 
+    def _project_path_map(self):
+        """
+        rel -> full path for the current file list, rebuilt only after it changes.
+
+        Handing the diff engine the same dict each time lets it keep its
+        lookup tables for the map between diffs.
+        """
+        source, pm = self._path_map
+        if source is not self.all_files:
+            pm = {r: f for r, f, *_ in self.all_files}
+            self._path_map = (self.all_files, pm)
+        return pm
+
     def _populate_tree(self):
-        for item in self.tree.get_children(''): self.tree.delete(item)
-        self.tree._checked.clear()
+        self.tree.clear()
+        self._tree_files = {}
         folders = {}
+        # Sorted input keeps a folder's files together, so the parent item
+        # is usually the one the previous file used
+        last_dir, parent = None, ''
         for rel, full, sz in sorted(self.all_files, key=lambda x: x[0]):
             parts = rel.replace('\\', '/').split('/')
-            parent = ''
-            for i, part in enumerate(parts[:-1]):
-                key = '/'.join(parts[:i + 1])
-                if key not in folders:
-                    folders[key] = self.tree.insert_with_check(parent, 'end', text=part, checked=True, values=('',))
-                parent = folders[key]
+            if parts[:-1] != last_dir:
+                last_dir = parts[:-1]
+                parent = ''
+                for i, part in enumerate(last_dir):
+                    key = '/'.join(parts[:i + 1])
+                    if key not in folders:
+                        folders[key] = self.tree.insert_with_check(parent, 'end', text=part, checked=True, values=('',))
+                    parent = folders[key]
             fn = parts[-1]
-            is_sens = any((p.startswith('*') and fn.lower().endswith(p[1:].lower())) or fn.lower() == p.lower() for p in self.sensitive_patterns)
-            self.tree.insert_with_check(parent, 'end', text=('!! ' if is_sens else '') + fn, checked=not is_sens, values=(self._format_size(sz),))
+            is_sens = self._is_sensitive(fn)
+            iid = self.tree.insert_with_check(parent, 'end', text=('!! ' if is_sens else '') + fn, checked=not is_sens, values=(self._format_size(sz),))
+            self._tree_files[iid] = (rel, full, sz)
 
     def _on_tree_dblclick(self, event):
         sel = self.tree.selection()
         if not sel: return
-        txt = self.tree.item(sel[0], 'text')
-        name = txt.lstrip('[v] [_] !! ').strip()
-        for rel, full, sz in self.all_files:
-            if rel.replace('\\', '/').endswith(name) or os.path.basename(rel) == name:
-                self._current_file_path = full
-                self.code_editor.load_file(full)
-                self.notebook.select(0)
-                self.status_var.set("opened: " + rel)
-                return
+        entry = self._tree_files.get(sel[0])
+        if entry:
+            rel, full, sz = entry
+            # The current path follows the editor once the load settles
+            self.code_editor.load_file(
+                full, on_loaded=lambda path, err, rel=rel: self._file_loaded(path, err, rel))
+            self.notebook.select(0)
+            self.status_var.set("opening: " + rel)
+
+    def _file_loaded(self, path, err, rel):
+        self._current_file_path = path
+        if err is None:
+            self.status_var.set("opened: " + rel)
+        else:
+            self.status_var.set(f"open failed: {rel} ({err})")
 
     def _save_file(self):
-        if self.code_editor.save_file():
-            name = os.path.basename(self.code_editor.file_path)
-            self.status_var.set("saved: " + name)
+        name = os.path.basename(self.code_editor.file_path or '')
+
+        def done(ok):
+            if ok:
+                self.status_var.set("saved: " + name)
+
+        if self.code_editor.save_file(on_done=done):
+            self.status_var.set("saving: " + name)
 
     # -- New Project / Scaffold --
 
@@ -351,8 +603,9 @@ class ProjectScan:
             os.makedirs(folder, exist_ok=True)
         self.project_path.set(folder)
         self.all_files = []
-        for item in self.tree.get_children(''):
-            self.tree.delete(item)
+        self._scanned_files = []
+        self._tree_files = {}
+        self.tree.clear()
         self.status_var.set(f"new project: {folder}")
         # Switch to Prompt tab and auto-generate scaffold prompt
         self._scaffold_prompt()
@@ -447,7 +700,7 @@ class ProjectScan:
         dt = self.diff_text.get("1.0", tk.END).strip()
         if not dt:
             self.diff_log_label.config(text="[!] diff text empty"); return
-        pm = {r: f for r, f, *_ in self.all_files}
+        pm = self._project_path_map()
         a = self.diff_engine.analyze(dt, pm)
         fmt_n = {'unrecognized': '[X] unrecognized', 'single_file': 'single file',
                  'single_file_named': 'single file (named)', 'multi_file': 'multi file',
@@ -477,6 +730,8 @@ class ProjectScan:
             messagebox.showwarning("warning", "diff is empty"); return
         if not self._current_file_path:
             messagebox.showwarning("warning", "open a file first"); return
+        if self.code_editor.is_loading:
+            messagebox.showwarning("warning", "file is still loading"); return
         parsed, file_ops = self.diff_engine.parse(dt)
         if not parsed and not file_ops:
             messagebox.showerror("parse error",
@@ -498,8 +753,13 @@ class ProjectScan:
         new_c, msgs = self.diff_engine.apply_to_content(content, all_cmds)
         log = '\n'.join(msgs)
         if any('[OK]' in m for m in msgs):
-            self.code_editor.set_content(new_c)
-            self.status_var.set("diff applied -- save needed")
+            if new_c == content:
+                # Already applied, or rolled back by a block; leave the
+                # buffer (and its modified state) alone
+                self.status_var.set("no changes")
+            else:
+                self.code_editor.set_content(new_c)
+                self.status_var.set("diff applied -- save needed")
         else:
             self.status_var.set("apply failed")
         self.diff_log_label.config(text=log[:600])
@@ -512,28 +772,52 @@ class ProjectScan:
         pp = self.project_path.get()
         if not pp:
             messagebox.showwarning("warning", "select project folder first"); return
-        pm = {r: f for r, f, *_ in self.all_files}
-
-        parsed, file_ops = self.diff_engine.parse(dt)
+        pm = self._project_path_map()
 
+        def do_parse():
+            try:
+                parsed, file_ops = self.diff_engine.parse(dt)
+                a = self.diff_engine.analyze(dt, pm) if (parsed or file_ops) else None
+            except Exception as e:
+                self.root.after(0, lambda e=e: self._multi_diff_failed("parse", e))
+                return
+            self.root.after(0, lambda: self._multi_diff_parsed(dt, pm, pp, parsed, file_ops, a))
+
+        self._set_diff_busy(True)
+        self.status_var.set("parsing diff...")
+        threading.Thread(target=do_parse, daemon=True).start()
+
+    def _set_diff_busy(self, busy):
+        """
+        Disable every diff action while a worker uses self.diff_engine.
+
+        The engine keeps mutable state (parse cache, path index and memo,
+        the file path used for brace checks) and is not safe to use from
+        the Tk thread and a worker at the same time.
+        """
+        for b in self._diff_buttons:
+            b.config(state='disabled' if busy else 'normal')
+
+    def _multi_diff_failed(self, stage, err):
+        self._set_diff_busy(False)
+        self.status_var.set(f"{stage} failed")
+        messagebox.showerror("Multi-file Apply", f"{stage} error: {err}")
+
+    def _multi_diff_parsed(self, dt, pm, pp, parsed, file_ops, a):
+        self._set_diff_busy(False)
+        self.status_var.set("ready")
         if not parsed and not file_ops:
             # 디버그: 토큰 감지 정보
-            text = TextNormalizer.full(dt)
-            tlines = text.split('\n')
-            found_file = sum(1 for l in tlines if LineDiffParser.RE_FILE_START.match(l))
-            found_replace = sum(1 for l in tlines if LineDiffParser.RE_CMD_REPLACE.match(l.strip()))
-            found_delete = sum(1 for l in tlines if LineDiffParser.RE_CMD_DELETE.match(l.strip()))
-            found_insert = sum(1 for l in tlines if LineDiffParser.RE_CMD_INSERT.match(l.strip()))
-            found_end = sum(1 for l in tlines if LineDiffParser.RE_CMD_END.match(l.strip()))
+            tc = self.diff_engine.parser.count_tokens(dt)
 
             messagebox.showerror("parse error",
                 f"No @@ commands found.\n\n"
                 f"Tokens detected:\n"
-                f"  === FILE: {found_file}\n"
-                f"  @@ N-M REPLACE: {found_replace}\n"
-                f"  @@ N DELETE: {found_delete}\n"
-                f"  @@ N INSERT: {found_insert}\n"
-                f"  @@ END: {found_end}\n"
+                f"  === FILE: {tc['file']}\n"
+                f"  @@ N-M REPLACE: {tc['replace']}\n"
+                f"  @@ N DELETE: {tc['delete']}\n"
+                f"  @@ N INSERT: {tc['insert']}\n"
+                f"  @@ END: {tc['end']}\n"
                 f"\nExpected format:\n"
                 f"=== FILE: path/file.js ===\n"
                 f"@@ 15-23 REPLACE\n"
@@ -542,15 +826,16 @@ class ProjectScan:
                 f"=== END FILE ===")
             return
 
-        a = self.diff_engine.analyze(dt, pm)
-
         if a['total_changes'] == 0 and not a.get('file_ops'):
             messagebox.showwarning("warning", "no valid changes"); return
 
         # Confirmation dialog
         fl_lines = []
+        nf = 0
         for f in a['files']:
             st = '[OK]' if f['found_in_project'] else '[X]'
+            if not f['found_in_project'] and f['path'] != '__current_file__':
+                nf += 1
             tags = []
             if f.get('rep_count'): tags.append(f"R:{f['rep_count']}")
             if f.get('del_count'): tags.append(f"D:{f['del_count']}")
@@ -560,7 +845,6 @@ class ProjectScan:
         msg = f"{a['file_count']} files, {a['total_changes']} changes\n\n"
         msg += '\n'.join(fl_lines) + '\n'
 
-        nf = sum(1 for f in a['files'] if not f['found_in_project'] and f['path'] != '__current_file__')
         if nf:
             msg += f"\n[!] {nf} files not found\n"
         msg += "\nProceed? (.bak backup will be created)"
@@ -568,18 +852,43 @@ class ProjectScan:
         if not messagebox.askyesno("Multi-file Apply", msg):
             return
 
-        results, summary = self.diff_engine.apply_and_save(dt, pm, pp)
+        def do_apply():
+            try:
+                results, summary = self.diff_engine.apply_and_save(dt, pm, pp)
+            except Exception as e:
+                self.root.after(0, lambda e=e: self._multi_diff_failed("apply", e))
+                return
+            self.root.after(0, lambda: self._multi_diff_applied(results, summary))
+
+        self._set_diff_busy(True)
+        self.status_var.set("applying diff...")
+        threading.Thread(target=do_apply, daemon=True).start()
 
+    def _multi_diff_applied(self, results, summary):
+        self._set_diff_busy(False)
         log_lines = ["=" * 55, "Multi-file Diff Result",
             f"saved:{summary['saved']} failed:{summary['failed']} skipped:{summary['skipped']}"
             f" created:{summary.get('created',0)} deleted:{summary.get('deleted',0)}",
             "=" * 55]
+        # One pass over the results for the log and everything derived below
+        saved_files, review_files = [], []
+        current_content = None
+        has_syntax_error = False
         for r in results:
             log_lines.append(f"\n{r['filepath']}")
             if r['resolved_path']:
                 log_lines.append(f"   -> {r['resolved_path']}")
-            for m in r['messages']:
-                log_lines.append(f"   {m}")
+            log_lines.extend(f"   {m}" for m in r['messages'])
+            if r['success']:
+                saved_files.append(r['filepath'])
+                if r['resolved_path']:
+                    # Review the text that was just written rather than
+                    # reading every saved file back from disk
+                    review_files.append((r['resolved_path'], r['new_content']))
+                    if r['resolved_path'] == self._current_file_path:
+                        current_content = r['new_content']
+            if r.get('syntax_error'):
+                has_syntax_error = True
         log = '\n'.join(log_lines)
 
         self.notebook.select(3)
@@ -588,15 +897,11 @@ class ProjectScan:
         self.github_log.insert("1.0", log)
         self.github_log.config(state=tk.DISABLED)
 
-        if self._current_file_path:
-            for r in results:
-                if r['resolved_path'] == self._current_file_path and r['success']:
-                    try:
-                        c, *_ = EncodingHandler.read_file(self._current_file_path)
-                        self.code_editor.set_content(c)
-                    except: pass
-                    break
-        self._last_saved_files = [r['filepath'] for r in results if r['success']]
+        # The saved text is already in hand; no need to read it back and
+        # re-detect its encoding on the Tk thread
+        if current_content is not None:
+            self.code_editor.set_content(current_content)
+        self._last_saved_files = saved_files
         messagebox.showinfo("Done",
             f"Saved: {summary['saved']}\nCreated: {summary.get('created',0)}\n"
             f"Deleted: {summary.get('deleted',0)}\nFailed: {summary['failed']}\n"
@@ -605,7 +910,6 @@ class ProjectScan:
             f"multi: saved {summary['saved']} created {summary.get('created',0)} "
             f"deleted {summary.get('deleted',0)} failed {summary['failed']}")
         # Check for syntax errors before auto-sync
-        has_syntax_error = any(r.get('syntax_error') for r in results)
         if has_syntax_error:
             messagebox.showwarning("Syntax Error",
                 "Syntax errors detected in saved files.\n"
@@ -615,10 +919,6 @@ class ProjectScan:
             return
 
         # === Code Review after diff ===
-        review_files = []
-        for r in results:
-            if r['success'] and r.get('resolved_path'):
-                review_files.append((r['resolved_path'], None))
         if review_files:
             all_issues = self.code_reviewer.review_files(review_files)
             if all_issues:
@@ -650,20 +950,8 @@ class ProjectScan:
 
     def _get_checked_files(self):
         checked = self.tree.get_checked()
-        result = []
-        for rel, full, sz in self.all_files:
-            fn = os.path.basename(rel)
-            for cid in checked:
-                txt = self.tree.item(cid, 'text')
-                # strip checkbox prefix and warning prefix
-                clean = txt
-                for prefix in ['[v] ', '[_] ', '!! ']:
-                    if clean.startswith(prefix):
-                        clean = clean[len(prefix):]
-                clean = clean.strip()
-                if clean == fn:
-                    result.append((rel, full, sz)); break
-        return result
+        rels = {self._tree_files[iid][0] for iid in checked if iid in self._tree_files}
+        return [f for f in self.all_files if f[0] in rels]
 
     def _merge_and_copy(self):
         prompt = self.prompt_text.get("1.0", tk.END).strip()
@@ -680,75 +968,17 @@ class ProjectScan:
             parts.append("---")
             parts.append(f"Attached files ({len(files)})")
             parts.append("")
-            parts.append("")
-            parts.append("```")
-            parts.append("=== FILE: relative/path/file.ext ===")
-            parts.append("## CONTEXT: line 14 | old_code_before_change")
-            parts.append("@@ 15-23 REPLACE")
-            parts.append("new code for lines 15 to 23")
-            parts.append("@@ END")
-            parts.append("## VERIFY: line 24 | old_code_after_change")
-            parts.append("@@ 50 DELETE 3")
-            parts.append("@@ 60 INSERT")
-            parts.append("code to insert after line 60")
-            parts.append("@@ END")
-            parts.append("=== END FILE ===")
-            parts.append("```")
-            parts.append("")
-            parts.append("=== CRITICAL RULES (violations will cause code corruption) ===")
-            parts.append("")
-            parts.append("1. LINE NUMBER ACCURACY:")
-            parts.append("   - Line numbers MUST match the ORIGINAL file exactly (shown as N| prefix)")
-            parts.append("   - ALWAYS verify the line number by checking the content at that line")
-            parts.append("   - If unsure about a line number, find the exact content first")
-            parts.append("")
-            parts.append("2. CONTEXT VERIFICATION (MANDATORY):")
-            parts.append("   - Before each @@ command, add a ## CONTEXT comment showing the line BEFORE the change:")
-            parts.append("     ## CONTEXT: line 14 | def existing_function():  ")
-            parts.append("     @@ 15-23 REPLACE")
-            parts.append("   - After each @@ END, add a ## VERIFY comment showing the line AFTER the change:")
-            parts.append("     @@ END")
-            parts.append("     ## VERIFY: line 24 | return result")
-            parts.append("   - These comments prove you checked the correct location")
-            parts.append("")
-            parts.append("3. ORDERING & SAFETY:")
-            parts.append("   - When making multiple changes to ONE file, list them from BOTTOM to TOP")
-            parts.append("     (highest line numbers first) to prevent line-number drift")
-            parts.append("   - NEVER modify more than 50 lines in a single REPLACE block")
-            parts.append("   - If changing >50 lines, split into multiple smaller REPLACE blocks")
-            parts.append("")
-            parts.append("4. INDENTATION & SYNTAX:")
-            parts.append("   - Preserve the EXACT indentation style of the original file (spaces vs tabs)")
-            parts.append("   - For Python: ensure consistent indentation (4 spaces per level)")
-            parts.append("   - The replacement code MUST be syntactically valid on its own")
-            parts.append("   - Do NOT leave unclosed brackets, parentheses, or string literals")
-            parts.append("")
-            parts.append("5. COMPLETENESS:")
-            parts.append("   - Include ALL lines in the replacement range, even unchanged ones")
-            parts.append("   - Do NOT use '...' or '# rest unchanged' — write every line explicitly")
-            parts.append("   - @@ START-END REPLACE : replace lines START through END with new content")
-            parts.append("   - @@ N DELETE COUNT : delete COUNT lines starting from line N")
-            parts.append("   - @@ N INSERT : insert new content AFTER line N (use 0 to insert at top)")
-            parts.append("   - Each REPLACE/INSERT block must end with @@ END")
-            parts.append("")
-            parts.append("6. FORMAT:")
-            parts.append("   - Do NOT use SEARCH/REPLACE blocks. Use ONLY @@ line commands")
-            parts.append("   - After all changes, state the REASON for each modification")
-            parts.append("   - The reason will be used as a GitHub commit message")
-            parts.append("")
-            parts.append("=== END RULES ===")
-            parts.append("---")
+            parts.extend(ATTACH_RULES)
 
-            for i, (rel, full, sz) in enumerate(files, 1):
-                try:
-                    content, *_ = EncodingHandler.read_file(full)
-                except Exception:
-                    content = "(read error)"
+            # Reads overlap in a small pool; map() keeps the checked order
+            with ThreadPoolExecutor(max_workers=min(8, len(files))) as ex:
+                contents = ex.map(_read_attachment, [full for rel, full, sz in files])
+            for i, ((rel, full, sz), content) in enumerate(zip(files, contents), 1):
                 ext = os.path.splitext(rel)[1].lstrip('.')
                 parts.append(f"### File {i}: {rel}")
                 parts.append(f"```{ext}")
-                for ln_num, line in enumerate(content.split('\n'), 1):
-                    parts.append(f"{ln_num:4d}| {line}")
+                lines = content.split('\n')
+                parts.extend(map(str.__add__, _line_prefixes(len(lines)), lines))
                 parts.append("```")
                 parts.append("")
 
@@ -759,10 +989,12 @@ class ProjectScan:
         self.root.clipboard_clear()
         self.root.clipboard_append(result)
 
-        self.preview_text.config(state='normal')
-        self.preview_text.delete("1.0", tk.END)
-        self.preview_text.insert("1.0", result)
-        self.preview_text.config(state='disabled')
+        if result != self._last_preview:
+            self._last_preview = result
+            self.preview_text.config(state='normal')
+            self.preview_text.delete("1.0", tk.END)
+            self.preview_text.insert("1.0", result)
+            self.preview_text.config(state='disabled')
 
         chars = len(result)
         tokens = chars // 4
@@ -951,6 +1183,9 @@ class ProjectScan:
         if not self._current_file_path:
             messagebox.showwarning("warning", "open a file first")
             return
+        if self.code_editor.is_loading:
+            messagebox.showwarning("warning", "file is still loading")
+            return
         content = self.code_editor.get_content()
         issues = self.code_reviewer.review_file(self._current_file_path, content)
         all_issues = {self._current_file_path: issues} if issues else {}
@@ -10,6 +10,8 @@ Run:  cd E:\genspark && python -m tests.test_diff_engine
 
 import sys
 import os
+import shutil
+import tempfile
 
 # Allow running from project root
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -21,6 +23,7 @@ from core.diff_engine import (
     LineDiffParser,
     LineDiffEngine,
 )
+from core.encoding_handler import EncodingHandler
 
 
 # ============================================================
@@ -550,6 +553,39 @@ replaced
     check("P8", 'test.cs' in parsed and len(parsed['test.cs']) == 2,
         "mixed commands in one file")
 
+    # P9: REPLACE without @@ END is closed by the next command
+    diff = """=== FILE: test.cs ===
+@@ 10-12 REPLACE
+replaced
+@@ 5 insert
+added
+@@ END
+=== END FILE ==="""
+    parsed, ops = parser.parse(diff)
+    cmds = parsed.get('test.cs', [])
+    check("P9", len(cmds) == 2 and cmds[0]['content'] == 'replaced'
+        and cmds[1]['type'] == 'insert' and cmds[1]['content'] == 'added',
+        "unterminated REPLACE stops at next command")
+
+    # P10: engine reuses the parse of identical diff text
+    engine = LineDiffEngine()
+    first = engine.parse(diff)
+    check("P10", engine.parse(diff) is first
+        and engine.parse(diff + "\n") is not first,
+        "engine parse cached per diff text")
+
+    # P11: token counts for parse-error hints
+    tc = parser.count_tokens(diff + "\n  @@ 3 DELETE 1\n== FILE: b.py ==")
+    check("P11", tc == {'file': 2, 'replace': 1, 'delete': 1, 'insert': 1, 'end': 1},
+        "count_tokens counts each marker kind")
+
+    # P12: payload without command tokens still yields its file ops
+    diff = "=== CREATE FILE: a.txt ===\nx == y\n=== END FILE ===\nplain text"
+    parsed, ops = parser.parse(diff)
+    check("P12", parsed == {} and len(ops) == 1 and ops[0]['content'] == 'x == y'
+        and parser.parse("no markers\nat all") == ({}, []),
+        "parse without @@ returns only file ops")
+
 
 # ============================================================
 #  Category 9: LineDiffEngine.apply_to_content
@@ -630,6 +666,18 @@ def test_apply_content():
     check("D7", has_ok and has_brace_ok,
         "valid C# REPLACE passes brace check")
 
+    # D8: mixed REPLACE/DELETE/INSERT keep original line numbers
+    original = "line1\nline2\nline3\nline4\nline5\nline6"
+    cmds = [
+        {'type': 'insert', 'after': 1, 'content': 'ins1a\nins1b'},
+        {'type': 'delete', 'start': 3, 'count': 1},
+        {'type': 'replace', 'start': 5, 'end': 6, 'content': 'new5'},
+    ]
+    engine._current_filepath = None
+    result, msgs = engine.apply_to_content(original, cmds)
+    check("D8", result == "line1\nins1a\nins1b\nline2\nline4\nnew5",
+        "mixed commands merged against original numbering")
+
     engine._current_filepath = None
 
 
@@ -719,6 +767,259 @@ def test_edge_cases():
     check("E10", ok, "UTF-8 BOM handled")
 
 
+# ============================================================
+#  Category 12: LineDiffEngine._resolve
+# ============================================================
+
+def test_resolve():
+    print("\n=== Category 12: _resolve ===")
+
+    engine = LineDiffEngine()
+    pm = {
+        'src\\app\\Main.cs': '/proj/src/app/Main.cs',
+        'src/lib/Util.cs': '/proj/src/lib/Util.cs',
+        'tests/lib/Util.cs': '/proj/tests/lib/Util.cs',
+        'README.md': '/proj/README.md',
+    }
+
+    # R1: exact match across separator styles
+    check("R1", engine._resolve('src/app/Main.cs', pm) == '/proj/src/app/Main.cs',
+        "backslash key resolved from forward-slash path")
+
+    # R2: case-insensitive match
+    check("R2", engine._resolve('SRC/APP/main.cs', pm) == '/proj/src/app/Main.cs',
+        "case-insensitive path resolved")
+
+    # R3: unique basename
+    check("R3", engine._resolve('docs/README.md', pm) == '/proj/README.md',
+        "unique basename resolved")
+
+    # R4: ambiguous basename picks longest suffix overlap
+    check("R4", engine._resolve('tests/lib/Util.cs', pm) == '/proj/tests/lib/Util.cs',
+        "ambiguous basename resolved by suffix overlap")
+
+    # R5: leading slash ignored
+    check("R5", engine._resolve('/src/lib/Util.cs', pm) == '/proj/src/lib/Util.cs',
+        "leading slash stripped")
+
+    # R6: unknown file
+    check("R6", engine._resolve('nope/Missing.cs', pm) is None,
+        "unknown file returns None")
+
+    # R7: empty inputs
+    check("R7", engine._resolve('', pm) is None and engine._resolve('a.cs', {}) is None,
+        "empty path or map returns None")
+
+    # R8: a grown map is re-indexed rather than served from the old index
+    pm['docs/Guide.md'] = '/proj/docs/Guide.md'
+    check("R8", engine._resolve('Guide.md', pm) == '/proj/docs/Guide.md',
+        "entry added to the map is found")
+
+    # R9: loose suffix fallback takes the first matching entry in map order
+    check("R9", engine._resolve('ide.md', pm) == '/proj/docs/Guide.md'
+        and engine._resolve('x/mysrc/lib/Util.cs.orig', {'.cs.orig': 1, 's.orig': 2}) == 1,
+        "string-suffix fallback in either direction")
+
+
+# ============================================================
+#  Category 13: resolve_and_apply_all / apply_and_save on disk
+# ============================================================
+
+def test_apply_files():
+    print("\n=== Category 13: apply on disk ===")
+
+    engine = LineDiffEngine()
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = {}
+        for name, body in [('a.py', 'a1\na2\na3'), ('b.py', 'b1\nb2'),
+                           ('c.txt', 'c1\nc2\nc3\nc4')]:
+            paths[name] = os.path.join(tmp, name)
+            with open(paths[name], 'w', encoding='utf-8') as f:
+                f.write(body)
+        diff = """=== FILE: c.txt ===
+@@ 2 DELETE 2
+=== END FILE ===
+=== FILE: a.py ===
+@@ 2-2 REPLACE
+A2
+@@ END
+=== END FILE ===
+=== FILE: missing.py ===
+@@ 1 INSERT
+x
+@@ END
+=== END FILE ===
+=== FILE: b.py ===
+@@ 2 INSERT
+b3
+@@ END
+=== END FILE ==="""
+
+        # W1: results keep diff order and carry the new content
+        results = engine.resolve_and_apply_all(diff, paths, tmp)
+        check("W1", [r['filepath'] for r in results]
+            == ['c.txt', 'a.py', 'missing.py', 'b.py']
+            and results[1]['new_content'] == 'a1\nA2\na3'
+            and results[3]['new_content'] == 'b1\nb2\nb3'
+            and results[0]['new_content'] == 'c1\nc4',
+            "multi-file apply ordered with correct content")
+
+        # W2: unresolved file reported, others unaffected
+        check("W2", not results[2]['success']
+            and any('not found' in m for m in results[2]['messages']),
+            "missing file reported as not found")
+
+        # W3: apply_and_save writes files and keeps a backup
+        results, summary = engine.apply_and_save(diff, paths, tmp)
+        with open(paths['a.py'], encoding='utf-8') as f:
+            saved = f.read()
+        with open(paths['a.py'] + '.bak', encoding='utf-8') as f:
+            backup = f.read()
+        check("W3", summary['saved'] == 3 and saved == 'a1\nA2\na3'
+            and backup == 'a1\na2\na3',
+            "apply_and_save writes new content and .bak backup")
+
+        # W4: BOM-less UTF-8 is saved back without a BOM
+        with open(paths['b.py'], 'rb') as f:
+            raw = f.read()
+        check("W4", raw == b'b1\nb2\nb3', "no BOM added to BOM-less file")
+
+        # W5: analyze reports per-kind counts and resolution
+        a = engine.analyze(diff + "\n=== FILE: a.py ===\n@@ 1 DELETE 1\n=== END FILE ===",
+                           paths)
+        fa = [f for f in a['files'] if f['path'] == 'a.py'][0]
+        fm = [f for f in a['files'] if f['path'] == 'missing.py'][0]
+        check("W5", a['total_changes'] == 5 and fa['rep_count'] == 1
+            and fa['del_count'] == 1 and fa['ins_count'] == 0
+            and fa['found_in_project'] and not fm['found_in_project'],
+            "analyze counts command kinds per file")
+
+        # W6: file ops are counted as created/deleted, not saved
+        ops = ("=== CREATE FILE: new.txt ===\nn1\n=== END FILE ===\n"
+               "=== DELETE FILE: c.txt ===\n=== DELETE FILE: gone.txt ===")
+        results, summary = engine.apply_and_save(ops, {}, tmp)
+        check("W6", summary['created'] == 1 and summary['deleted'] == 1
+            and summary['saved'] == 0 and summary['skipped'] == 1
+            and not os.path.exists(paths['c.txt'])
+            and os.path.exists(os.path.join(tmp, 'new.txt')),
+            "apply_and_save counts created and deleted files")
+
+        # W7: a hard-linked target is written in place, keeping the link
+        if hasattr(os, 'link'):
+            alias = os.path.join(tmp, 'alias.py')
+            os.link(paths['b.py'], alias)
+            engine.apply_and_save("=== FILE: b.py ===\n@@ 1-1 REPLACE\nB1\n@@ END\n"
+                                  "=== END FILE ===", paths, tmp)
+            with open(alias, encoding='utf-8') as f:
+                linked = f.read()
+            check("W7", linked.startswith('B1\n')
+                and os.path.samefile(alias, paths['b.py']),
+                "hard-linked file updated in place")
+
+        # W8: a refused rename (file held open on Windows) falls back to
+        # copy + in-place write
+        locked = os.path.join(tmp, 'locked.py')
+        with open(locked, 'w', encoding='utf-8') as f:
+            f.write('l1\nl2')
+        real_replace = os.replace
+        def refuse(src, dst):
+            if src == locked:
+                raise PermissionError("in use")
+            real_replace(src, dst)
+        os.replace = refuse
+        try:
+            results, summary = engine.apply_and_save(
+                "=== FILE: locked.py ===\n@@ 2-2 REPLACE\nL2\n@@ END\n=== END FILE ===",
+                {'locked.py': locked}, tmp)
+        finally:
+            os.replace = real_replace
+        with open(locked, encoding='utf-8') as f:
+            saved = f.read()
+        with open(locked + '.bak', encoding='utf-8') as f:
+            backup = f.read()
+        check("W8", summary['saved'] == 1 and saved == 'l1\nL2' and backup == 'l1\nl2'
+            and not [n for n in os.listdir(tmp) if n.endswith('.tmp')],
+            "refused rename saves in place with backup")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ============================================================
+#  Category 14: EncodingHandler read caches
+# ============================================================
+
+def test_encoding_cache():
+    print("\n=== Category 14: EncodingHandler read caches ===")
+
+    tmp = tempfile.mkdtemp()
+    memo = EncodingHandler._last_encoding
+    try:
+        def write(name, raw):
+            path = os.path.join(tmp, name)
+            with open(path, 'wb') as f:
+                f.write(raw)
+            return path
+
+        # N1: a legacy encoding is remembered for its path
+        kr = write('kr.txt', '한글 주석\n'.encode('cp949'))
+        content, enc, bom, le = EncodingHandler.read_file(kr)
+        check("N1", content == '한글 주석\n' and enc == 'cp949' and memo.get(kr) == 'cp949',
+            "cp949 file decoded and its encoding remembered")
+
+        # N2: UTF-8 and BOM files are never recorded
+        u8 = write('u8.txt', '한글\n'.encode('utf-8'))
+        sig = write('sig.txt', b'\xef\xbb\xbfx = 1\n')
+        r8 = EncodingHandler.read_file(u8)
+        rs = EncodingHandler.read_file(sig)
+        check("N2", r8[1] == 'utf-8' and rs[1] == 'utf-8-sig' and rs[2]
+            and u8 not in memo and sig not in memo,
+            "UTF-8 and BOM files leave no encoding hint")
+
+        # N3: a stale hint falls back and is dropped once the file changes
+        write('kr.txt', '한글\n'.encode('utf-8'))
+        ok_utf8 = EncodingHandler.read_file(kr)[:2] == ('한글\n', 'utf-8')
+        memo[kr] = 'cp949'
+        write('kr.txt', b'cafe\xe9')  # lone lead byte: not valid cp949
+        r = EncodingHandler.read_file(kr)
+        check("N3", ok_utf8 and r[1] != 'cp949' and memo.get(kr) != 'cp949',
+            "stale hint falls back to detection and is dropped")
+
+        # N4: the hint table is bounded, oldest entry evicted first
+        first = write('lru0.txt', '가'.encode('cp949'))
+        EncodingHandler.read_file(first)
+        for i in range(1, EncodingHandler.READ_CACHE_SIZE + 1):
+            EncodingHandler.read_file(write('lru%d.txt' % i, '가'.encode('cp949')))
+        check("N4", len(memo) <= EncodingHandler.READ_CACHE_SIZE and first not in memo,
+            "encoding hints capped at READ_CACHE_SIZE")
+
+        # N5: read_file_cached reuses the result while the file is unchanged
+        cached = write('cached.txt', b'one\n')
+        first = EncodingHandler.read_file_cached(cached)
+        check("N5", EncodingHandler.read_file_cached(cached) is first
+            and first[0] == 'one\n',
+            "unchanged file served from the read cache")
+
+        # N6: a size or mtime change invalidates the entry
+        write('cached.txt', b'two!\n')
+        by_size = EncodingHandler.read_file_cached(cached)
+        write('cached.txt', b'six!\n')
+        st = os.stat(cached)
+        os.utime(cached, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        by_mtime = EncodingHandler.read_file_cached(cached)
+        check("N6", by_size[0] == 'two!\n' and by_mtime[0] == 'six!\n',
+            "size and mtime changes force a re-read")
+
+        # N7: the read cache is bounded, oldest entry evicted first
+        cache = EncodingHandler._read_cache
+        for i in range(EncodingHandler.READ_CACHE_SIZE):
+            EncodingHandler.read_file_cached(write('rc%d.txt' % i, b'x'))
+        check("N7", len(cache) == EncodingHandler.READ_CACHE_SIZE and cached not in cache,
+            "read cache capped at READ_CACHE_SIZE")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
 # ============================================================
 #  Main
 # ============================================================
@@ -739,6 +1040,9 @@ def main():
     test_apply_content()
     test_template_literals()
     test_edge_cases()
+    test_resolve()
+    test_apply_files()
+    test_encoding_cache()
 
     print("\n" + "=" * 60)
     print("  RESULTS: %d passed, %d failed" % (_pass_count, _fail_count))